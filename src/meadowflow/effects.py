@@ -3,7 +3,7 @@ from __future__ import annotations
 import atexit
 import dataclasses
 import pickle
-from typing import Iterable, Dict, Optional, Sequence, Tuple, Set, Literal
+from typing import Iterable, Dict, Optional, Sequence, Tuple, Literal
 
 # TODO consider making this work without the meadowdb dependency?
 import meadowdb.connection
@@ -142,29 +142,33 @@ class UntilMeadowdbWritten(meadowflow.topic.StatePredicate):
         else:
             job_name = self.job_name
 
-        # probably need an option to not go all the way back in time...
-        all_effects: Iterable[Effects] = (
-            event.payload.effects
-            for event in event_log.events(job_name, 0, high_timestamp)
-            if event.payload.effects is not None
-        )
-        tables_written: Set[Tuple[str, str]] = set(
-            table_written
-            for effects in all_effects
-            for conn, meadowdb_effects in effects.meadowdb_effects.items()
-            for table_written in meadowdb_effects.tables_written.keys()
-        )
-
-        if self.operation == "all":
-            return not all(table in tables_written for table in self.table_names)
-        elif self.operation == "any":
-            if not self.table_names:
-                return not bool(tables_written)
-            else:
-                return not any(table in tables_written for table in self.table_names)
-        else:
+        if self.operation not in ("all", "any"):
             raise ValueError(f"Unexpected operation {self.operation}")
 
+        # We walk the job's events newest first and stop as soon as we know the answer,
+        # rather than collecting every table the job has ever written. remaining is the
+        # set of table_names that we haven't seen a write to yet.
+        remaining = set(self.table_names)
+        # probably need an option to not go all the way back in time...
+        for event in event_log.events(job_name, 0, high_timestamp):
+            if event.payload.effects is None:
+                continue
+            for meadowdb_effects in event.payload.effects.meadowdb_effects.values():
+                for table_written in meadowdb_effects.tables_written.keys():
+                    if self.operation == "any":
+                        # any() with no table_names is False once anything is written
+                        if not self.table_names or table_written in remaining:
+                            return False
+                    else:
+                        remaining.discard(table_written)
+                        if not remaining:
+                            return False
+
+        # we've gone through all the events without finding the writes we're looking
+        # for. remaining can only be empty here if table_names is empty, in which case
+        # all() is vacuously written.
+        return self.operation == "any" or bool(remaining)
+
     @classmethod
     def any(
         cls, *table_names: Tuple[str, str], job_name: TopicName = CURRENT_JOB
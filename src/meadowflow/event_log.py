@@ -5,6 +5,7 @@ import logging
 from dataclasses import dataclass
 from types import TracebackType
 from typing import (
+    AbstractSet,
     Any,
     Awaitable,
     Callable,
@@ -64,7 +65,8 @@ class EventLog:
         # have been called for events with timestamp < _subscribers_called_timestamp.
         self._subscribers_called_timestamp: Timestamp = 0
 
-        # the log of events, in increasing timestamp order
+        # the log of events, in increasing timestamp order. Because timestamps are
+        # assigned sequentially, _event_log[t].timestamp == t
         self._event_log: List[Event] = []
 
         self._topic_name_to_events: Dict[TopicName, List[Event]] = {}
@@ -75,6 +77,9 @@ class EventLog:
         # subscribers to all events
         self._universal_subscribers: Set[Subscriber] = set()
 
+        # subscribers to events whose payload is an instance of a particular type
+        self._payload_type_subscribers: Dict[type, Set[Subscriber]] = {}
+
         # Init for these needs to be on an event loop - see _init_async and __await__.
         # notify our call subscribers loop that events have been posted to the event log
         self._notify_call_subscribers: asyncio.Event
@@ -132,10 +137,13 @@ class EventLog:
         with the specified topic_name.
         """
         if topic_name is None:
-            all_events = self._event_log
-        else:
-            all_events = self._topic_name_to_events.get(topic_name, [])
+            # see comment on _event_log, we can slice directly rather than scanning
+            if high_timestamp > 0:
+                low_index = max(low_timestamp, 0)
+                yield from reversed(self._event_log[low_index:high_timestamp])
+            return
 
+        all_events = self._topic_name_to_events.get(topic_name, [])
         for event in reversed(all_events):
             if low_timestamp <= event.timestamp < high_timestamp:
                 yield event
@@ -180,14 +188,20 @@ class EventLog:
         return None
 
     def subscribe(
-        self, topic_names: Optional[Iterable[TopicName]], subscriber: Subscriber
+        self,
+        topic_names: Optional[Iterable[TopicName]],
+        subscriber: Subscriber,
+        payload_type: Optional[type] = None,
     ) -> None:
         """
         If topic_names is None, subscribe subscriber to all events. If topic_names is
-        not None, subscribe to events matching one of the topic_names.
+        not None, subscribe to events matching one of the topic_names. If payload_type
+        is not None, topic_names must be None, and subscriber will only get events where
+        event.payload is an instance of payload_type.
 
         Subscribing to topics is idempotent - i.e. subscribing to the same topic twice
-        still results in a single notification.
+        still results in a single notification. Similarly, subscribing to a topic and to
+        a payload type that both match an event only delivers that event once.
 
         The EventLog processes a batch of events at a time, which means that subscriber
         may be getting called once even though multiple events have happened. subscriber
@@ -198,16 +212,27 @@ class EventLog:
         a particular subscriber will always see a low_timestamp equal to the previous
         high_timestamp: subscriber won't be called at all for a batch if there are no
         matching events (a "universal subscriber" i.e. one without topic_names will
-        always see low_timestamp equal to the previous high_timestamp).
+        always see low_timestamp equal to the previous high_timestamp). Subscribers with
+        a payload_type behave like topical subscribers in this respect.
         """
-        # To ensure idempotence given universal subscribers and topical subscribers,
-        # some shenanigans needed here.
-        if topic_names is None:
+        if payload_type is not None and topic_names is not None:
+            raise ValueError("Cannot specify both topic_names and payload_type")
+
+        # To ensure idempotence given universal subscribers and topical/payload type
+        # subscribers, some shenanigans needed here.
+        if payload_type is not None:
+            if subscriber not in self._universal_subscribers:
+                self._payload_type_subscribers.setdefault(payload_type, set()).add(
+                    subscriber
+                )
+        elif topic_names is None:
             self._universal_subscribers.add(subscriber)
             # unsubscribe from topics. Could speed this up by keeping reverse dict of
             # subscribers-to-topic.
             for per_topic_subscribers in self._topic_subscribers.values():
-                per_topic_subscribers.remove(subscriber)
+                per_topic_subscribers.discard(subscriber)
+            for per_type_subscribers in self._payload_type_subscribers.values():
+                per_type_subscribers.discard(subscriber)
         elif subscriber not in self._universal_subscribers:
             for topic_name in topic_names:
                 self._topic_subscribers.setdefault(topic_name, set()).add(subscriber)
@@ -236,9 +261,11 @@ class EventLog:
             try:
                 low_timestamp = self._subscribers_called_timestamp
                 high_timestamp = self._next_timestamp
-                events_to_process = list(
-                    self.events(None, low_timestamp, high_timestamp)
-                )
+                # timestamps are assigned sequentially from 0, so an event's timestamp
+                # is also its index into _event_log. Slicing is much cheaper than
+                # walking self.events, and we reverse to match its newest-first order.
+                events_to_process = self._event_log[low_timestamp:high_timestamp]
+                events_to_process.reverse()
 
                 # get the list of subscribers that need to be called
                 subscribers: Dict[Subscriber, List[Event]] = {
@@ -246,11 +273,25 @@ class EventLog:
                     for subscriber in self._universal_subscribers
                 }
 
+                payload_type_subscribers = [
+                    (payload_type, type_subscribers)
+                    for payload_type, type_subscribers in (
+                        self._payload_type_subscribers.items()
+                    )
+                    if type_subscribers
+                ]
                 for event in events_to_process:
-                    topic_subscribers = self._topic_subscribers.get(event.topic_name)
-                    if topic_subscribers:
-                        for subscriber in topic_subscribers:
-                            subscribers.setdefault(subscriber, []).append(event)
+                    event_subscribers: AbstractSet[
+                        Subscriber
+                    ] = self._topic_subscribers.get(event.topic_name, frozenset())
+                    for payload_type, type_subscribers in payload_type_subscribers:
+                        if isinstance(event.payload, payload_type):
+                            # a subscriber can be subscribed to this event's topic and
+                            # to one or more matching payload types, but it should
+                            # still only see the event once
+                            event_subscribers = event_subscribers | type_subscribers
+                    for subscriber in event_subscribers:
+                        subscribers.setdefault(subscriber, []).append(event)
 
                 # call the subscribers
                 results = await asyncio.gather(
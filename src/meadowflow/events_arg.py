@@ -24,7 +24,24 @@ class LatestEventsArg:
     automatically get events for all topics that the job depends on via trigger_actions.
     """
 
-    topic_names: Sequence[TopicName]
+    # Jobs can have many of these, so we avoid a per-instance __dict__.
+    # (dataclass(slots=True) requires python 3.10.)
+    __slots__ = ("topic_names",)
+
+    topic_names: Tuple[TopicName, ...]
+
+    def __post_init__(self) -> None:
+        # make sure topic_names is a tuple even if we were given e.g. a list, so that
+        # LatestEventsArg is hashable like other frozen dataclasses
+        if not isinstance(self.topic_names, tuple):
+            object.__setattr__(self, "topic_names", tuple(self.topic_names))
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # The default pickling for a class with __slots__ sets each attribute after
+        # construction, which fails for a frozen dataclass. LatestEventsArgs get
+        # pickled e.g. as part of job definitions, so we pickle it as a constructor call
+        # instead.
+        return LatestEventsArg, (self.topic_names,)
 
     @classmethod
     def construct(cls, *topic_names: TopicName) -> LatestEventsArg:
@@ -41,14 +58,23 @@ def replace_latest_events(
     Replaces any instances of LatestEventsArg() in the job_runner_function. See
     LatestEventsArg for description of semantics.
     """
+    # The same topic often appears in more than one LatestEventsArg for a job (e.g. when
+    # they're all empty and default to job.all_subscribed_topics), so we only look up
+    # the last event for each topic once
+    last_events_cache: Dict[TopicName, Optional[Event]] = {}
+
     if isinstance(job_runner_function, meadowflow.jobs.LocalFunction):
         return _replace_latest_events_function(
-            job_runner_function, job, event_log, latest_timestamp
+            job_runner_function, job, event_log, latest_timestamp, last_events_cache
         )[1]
     elif isinstance(job_runner_function, MeadowGridDeployedRunnable):
         if isinstance(job_runner_function.runnable, MeadowGridFunction):
             need_replacement, new_function = _replace_latest_events_function(
-                job_runner_function.runnable, job, event_log, latest_timestamp
+                job_runner_function.runnable,
+                job,
+                event_log,
+                latest_timestamp,
+                last_events_cache,
             )
             if need_replacement:
                 return dataclasses.replace(job_runner_function, runnable=new_function)
@@ -61,9 +87,10 @@ def replace_latest_events(
                     job,
                     event_log,
                     latest_timestamp,
+                    last_events_cache,
                 )
                 if need_replacement:
-                    dataclasses.replace(
+                    return dataclasses.replace(
                         job_runner_function,
                         runnable=dataclasses.replace(
                             job_runner_function.runnable, context_variables=new_vars
@@ -84,6 +111,7 @@ def _replace_latest_events_function(
     job: meadowflow.jobs.Job,
     event_log: EventLog,
     latest_timestamp: Timestamp,
+    last_events_cache: Dict[TopicName, Optional[Event]],
 ) -> Tuple[bool, meadowflow.jobs.LocalFunction]:
     ...
 
@@ -94,6 +122,7 @@ def _replace_latest_events_function(
     job: meadowflow.jobs.Job,
     event_log: EventLog,
     latest_timestamp: Timestamp,
+    last_events_cache: Dict[TopicName, Optional[Event]],
 ) -> Tuple[bool, MeadowGridFunction]:
     ...
 
@@ -103,6 +132,7 @@ def _replace_latest_events_function(
     job: meadowflow.jobs.Job,
     event_log: EventLog,
     latest_timestamp: Timestamp,
+    last_events_cache: Dict[TopicName, Optional[Event]],
 ) -> Tuple[bool, Union[meadowflow.jobs.LocalFunction, MeadowGridFunction]]:
     """
     Helper for replace_latest_events. This function should work on any dataclass that
@@ -112,14 +142,18 @@ def _replace_latest_events_function(
 
     if function.function_args:
         need_replacement, new_args = _replace_latest_events_list(
-            function.function_args, job, event_log, latest_timestamp
+            function.function_args, job, event_log, latest_timestamp, last_events_cache
         )
         if need_replacement:
             to_replace["function_args"] = new_args
 
     if function.function_kwargs:
         need_replacement, new_kwargs = _replace_latest_events_dict(
-            function.function_kwargs, job, event_log, latest_timestamp
+            function.function_kwargs,
+            job,
+            event_log,
+            latest_timestamp,
+            last_events_cache,
         )
         if need_replacement:
             to_replace["function_kwargs"] = new_kwargs
@@ -135,61 +169,67 @@ def _replace_latest_events_list(
     job: meadowflow.jobs.Job,
     event_log: EventLog,
     latest_timestamp: Timestamp,
+    last_events_cache: Dict[TopicName, Optional[Event]],
 ) -> Tuple[bool, Sequence[Any]]:
     """Helper for replace_latest_events"""
-    new_xs = []
-    any_need_replacement = False
-    for x in xs:
-        if isinstance(x, LatestEventsArg):
-            new_xs.append(
-                _replace_latest_events_arg(x, job, event_log, latest_timestamp)
-            )
-            any_need_replacement = True
-        else:
-            new_xs.append(x)
-    if any_need_replacement:
-        # we always return a list regardless of what kind of sequence xs originally was,
-        # which should be okay?
-        return True, new_xs
-    else:
+    # most functions don't have any LatestEventsArgs, so we check for that before
+    # copying xs
+    if not any(isinstance(x, LatestEventsArg) for x in xs):
         return False, xs
 
+    # we always return a list regardless of what kind of sequence xs originally was,
+    # which should be okay?
+    return True, [
+        _replace_latest_events_arg(
+            x, job, event_log, latest_timestamp, last_events_cache
+        )
+        if isinstance(x, LatestEventsArg)
+        else x
+        for x in xs
+    ]
+
 
 def _replace_latest_events_dict(
     kwargs: Dict[str, Any],
     job: meadowflow.jobs.Job,
     event_log: EventLog,
     latest_timestamp: Timestamp,
+    last_events_cache: Dict[TopicName, Optional[Event]],
 ) -> Tuple[bool, Dict[str, Any]]:
     """Helper for replace_latest_events"""
-    new_kwargs = {}
-    any_need_replacement = False
-    for key, value in kwargs.items():
-        if isinstance(value, LatestEventsArg):
-            new_kwargs[key] = _replace_latest_events_arg(
-                value, job, event_log, latest_timestamp
-            )
-            any_need_replacement = True
-        else:
-            new_kwargs[key] = value
-    if any_need_replacement:
-        return True, new_kwargs
-    else:
+    # see _replace_latest_events_list
+    if not any(isinstance(value, LatestEventsArg) for value in kwargs.values()):
         return False, kwargs
 
+    return True, {
+        key: _replace_latest_events_arg(
+            value, job, event_log, latest_timestamp, last_events_cache
+        )
+        if isinstance(value, LatestEventsArg)
+        else value
+        for key, value in kwargs.items()
+    }
+
 
 def _replace_latest_events_arg(
     arg: LatestEventsArg,
     job: meadowflow.jobs.Job,
     event_log: EventLog,
     latest_timestamp: Timestamp,
+    last_events_cache: Dict[TopicName, Optional[Event]],
 ) -> FrozenDict[TopicName, Optional[Event]]:
     """Helper for replace_latest_events"""
-    topic_names = arg.topic_names
+    topic_names: Sequence[TopicName] = arg.topic_names
     if len(topic_names) == 0:
         topic_names = job.all_subscribed_topics or tuple()
 
-    return FrozenDict(
-        (topic_name, event_log.last_event(topic_name, latest_timestamp))
-        for topic_name in topic_names
-    )
+    result = {}
+    for topic_name in topic_names:
+        if topic_name in last_events_cache:
+            result[topic_name] = last_events_cache[topic_name]
+        else:
+            result[topic_name] = last_events_cache[topic_name] = event_log.last_event(
+                topic_name, latest_timestamp
+            )
+    # result is never modified after this, so we don't need FrozenDict to copy it
+    return FrozenDict.from_dict(result)
@@ -9,6 +9,7 @@ import uuid
 from dataclasses import dataclass
 from typing import (
     Final,
+    FrozenSet,
     Iterable,
     Sequence,
     List,
@@ -484,11 +485,19 @@ class AnyJobStateEventFilter(meadowflow.topic.EventFilter):
     job_names: Sequence[TopicName]
     on_states: Sequence[JobState]
 
+    # a set version of on_states, as apply gets called on every event for job_names
+    _on_states_set: FrozenSet[JobState] = dataclasses.field(
+        init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "_on_states_set", frozenset(self.on_states))
+
     def topic_names_to_subscribe(self) -> Iterable[TopicName]:
         yield from self.job_names
 
     def apply(self, event: Event) -> bool:
-        return event.payload.state in self.on_states
+        return event.payload.state in self._on_states_set
 
 
 @dataclass(frozen=True)
@@ -2,7 +2,6 @@ from __future__ import annotations
 
 import asyncio
 import dataclasses
-import itertools
 import logging
 import traceback
 from asyncio.tasks import Task
@@ -100,33 +99,13 @@ def _get_jobs_or_scopes_from_result(
         # We don't want to just iterate through every Iterable we get back, iterating
         # through those Iterables could have side effects. Seems fine to only accept
         # lists and tuples.
-        element_type = None
-        for r in result:
-            if isinstance(r, Job):
-                if element_type is None:
-                    element_type = "job"
-                elif element_type == "job":
-                    pass
-                else:
-                    # this means we have incompatible types
-                    return "none", None
-            elif isinstance(r, ScopeValues):
-                if element_type is None:
-                    element_type = "scope"
-                elif element_type == "scope":
-                    pass
-                else:
-                    # this means we have incompatible types
-                    return "none", None
-            else:
-                # this means we have a non-job or non-scope in our iterable
-                return "none", None
-        if element_type == "job":
+        if all(isinstance(r, Job) for r in result):
             return "jobs", result
-        elif element_type == "scope":
+        elif all(isinstance(r, ScopeValues) for r in result):
             return "scopes", result
         else:
-            # this should never happen, but probably better to be defensive here
+            # this means we have incompatible types or something that's not a job or
+            # scope in our list
             return "none", None
     else:
         return "none", None
@@ -146,6 +125,9 @@ class MeadowdbDependencyAction:
     job: Job
     action: Action
     state_predicate: StatePredicate
+    # the MeadowdbDynamicDependency.dependency_scope, i.e. writes from jobs in this
+    # scope (or any scope if this is ALL_SCOPES) can trigger the action
+    dependency_scope: ScopeValues
 
     # This holds state, "what tables did this job read the last time it ran". If any of
     # these tables get written to, that means we should trigger the job/action that this
@@ -153,6 +135,51 @@ class MeadowdbDependencyAction:
     latest_tables_read: Optional[Set[Tuple[ConnectionKey, Tuple[str, str]]]] = None
 
 
+class _TriggerActionSubscriber:
+    """
+    The EventLog subscriber that Scheduler.create_job_subscriptions creates for each
+    distinct EventFilter. targets is a list of (job, condition, action) for every
+    TriggerAction that wakes on event_filter. When at least one of the events passes
+    event_filter, we execute each action whose condition is met. This way, if many jobs
+    wake on the same EventFilter, we only evaluate it once per batch of events.
+    """
+
+    __slots__ = ("scheduler", "event_filter", "topic_names", "targets")
+
+    def __init__(self, scheduler: Scheduler, event_filter: EventFilter) -> None:
+        self.scheduler = scheduler
+        self.event_filter = event_filter
+        self.topic_names = tuple(event_filter.topic_names_to_subscribe())
+        self.targets: List[Tuple[Job, StatePredicate, Action]] = []
+
+    async def __call__(
+        self, low_timestamp: Timestamp, high_timestamp: Timestamp, events: List[Event]
+    ) -> None:
+        # first check that there's at least one event that passes the EventFilter. We
+        # only subscribe to self.topic_names, so the EventLog will only give us events
+        # for those topics.
+        if not any(map(self.event_filter.apply, events)):
+            return
+
+        # then check which conditions are met and execute those actions
+        event_log = self.scheduler._event_log
+        futures = [
+            self.scheduler._execute_action(action, job, None, high_timestamp)
+            for job, condition, action in self.targets
+            if condition.apply(event_log, low_timestamp, high_timestamp, job.name)
+        ]
+        if len(futures) == 1:
+            await futures[0]
+        elif futures:
+            # one action failing shouldn't stop the others from running
+            results = await asyncio.gather(*futures, return_exceptions=True)
+            for result in results:
+                if isinstance(result, BaseException):
+                    logging.exception(
+                        "Unexpected exception while executing action", exc_info=result
+                    )
+
+
 class Scheduler:
     """
     A scheduler gets set up with jobs, and then executes actions on jobs as per the
@@ -160,6 +187,9 @@ class Scheduler:
     """
 
     _JOB_RUNNER_POLL_DELAY_SECONDS: float = 1
+    # when a job has just been requested, we start polling at this delay and back off
+    # exponentially to job_runner_poll_delay_seconds
+    _JOB_RUNNER_MIN_POLL_DELAY_SECONDS: float = 0.1
 
     def __init__(
         self,
@@ -174,15 +204,26 @@ class Scheduler:
         # see create_job_subscriptions docstring. Only used temporarily when adding jobs
         self._create_job_subscriptions_queue: List[Job] = []
         # See comment on MeadowdbDependencyAction, this allows us to implement
-        # MeadowdbDynamicDependency. We need to be able to look up keep track of the
-        # MeadowdbDynamicDependencies per dependency scope (NOT the job scope!) AND by
-        # the job name (see _process_meadowdb_effects docstring for more information).
-        # Very important that the MeadowdbDependencyActions referenced by both
-        # dictionaries are the same objects.
-        self._meadowdb_dependencies_scope: Dict[
-            ScopeValues, List[MeadowdbDependencyAction]
-        ] = {}
+        # MeadowdbDynamicDependency. We keep track of the MeadowdbDependencyActions by
+        # the job name, and also keep an index from each table to the names of the jobs
+        # whose latest_tables_read include that table, so that a write only needs to
+        # look at the dependencies that read the tables written to (see
+        # _process_meadowdb_effects docstring for more information).
         self._meadowdb_dependencies_name: Dict[TopicName, MeadowdbDependencyAction] = {}
+        self._meadowdb_dependencies_table: Dict[
+            Tuple[ConnectionKey, Tuple[str, str]], Set[TopicName]
+        ] = {}
+        # the names of jobs that _process_effects has seen go into RUN_REQUESTED or
+        # RUNNING and hasn't yet seen leave those states. This lets the poll loop only
+        # look at the jobs that might be running rather than every job we know about.
+        self._active_job_names: Set[TopicName] = set()
+        # the number of actions currently executing on each job, see _execute_action
+        self._executing_action_counts: Dict[TopicName, int] = {}
+        # the subscriber for each EventFilter that jobs wake on, see
+        # _TriggerActionSubscriber
+        self._trigger_action_subscribers: Dict[
+            EventFilter, _TriggerActionSubscriber
+        ] = {}
 
         # how frequently to poll the job runners
         self._job_runner_poll_delay_seconds: float = job_runner_poll_delay_seconds
@@ -199,8 +240,11 @@ class Scheduler:
         self.time: TimeEventPublisher = await TimeEventPublisher(
             self._event_log.append_event
         )
+        # set by _process_effects when a job gets requested/starts running, so that the
+        # poll loop can go to sleep while there are no jobs to poll
+        self._job_run_requested: asyncio.Event = asyncio.Event()
         # create the effects subscriber
-        self._event_log.subscribe(None, self._process_effects)
+        self._event_log.subscribe(None, self._process_effects, JobPayload)
 
         # The local job runner is a special job runner that runs on the same machine as
         # meadowflow via multiprocessing.
@@ -254,7 +298,10 @@ class Scheduler:
         # TODO: should make sure we don't try to proceed without calling
         #  create_job_subscriptions first
         for job in self._create_job_subscriptions_queue:
-            job.all_subscribed_topics = []
+            # a dict rather than a list so that topics that appear in more than one
+            # EventFilter/StatePredicate are only included once, in the order we first
+            # see them
+            all_subscribed_topics: Dict[TopicName, None] = {}
             for trigger_action in job.trigger_actions:
                 # this registers time events in the StatePredicate with our
                 # TimeEventPublisher so that it knows we need to trigger at those times
@@ -276,63 +323,50 @@ class Scheduler:
                         #  trigger action, we should probably throw an error in that
                         #  case
                         dependency_action = MeadowdbDependencyAction(
-                            job, trigger_action.action, trigger_action.state_predicate
+                            job,
+                            trigger_action.action,
+                            trigger_action.state_predicate,
+                            event_filter.dependency_scope,
                         )
-                        self._meadowdb_dependencies_scope.setdefault(
-                            event_filter.dependency_scope, []
-                        ).append(dependency_action)
                         self._meadowdb_dependencies_name[job.name] = dependency_action
                     else:
-
-                        async def subscriber(
-                            low_timestamp: Timestamp,
-                            high_timestamp: Timestamp,
-                            events: List[Event],
-                            # to avoid capturing loop variables
-                            job: Job = job,
-                            event_filter: EventFilter = event_filter,
-                            condition: StatePredicate = condition,
-                            action: Action = trigger_action.action,
-                        ) -> None:
-                            # first check that there's at least one event that passes
-                            # the EventFilter
-                            if any(
-                                event_filter.apply(event)
-                                for topic_name in event_filter.topic_names_to_subscribe()  # noqa: E501
-                                for event in events
-                                if event.topic_name == topic_name
-                            ):
-                                # then check that the condition is met and if so execute
-                                # the action
-                                if condition.apply(
-                                    self._event_log,
-                                    low_timestamp,
-                                    high_timestamp,
-                                    job.name,
-                                ):
-                                    await action.execute(
-                                        job,
-                                        None,
-                                        self._job_runners,
-                                        self._event_log,
-                                        high_timestamp,
-                                    )
+                        # share a single subscriber between all of the TriggerActions
+                        # that wake on an equal EventFilter. EventFilters that aren't
+                        # hashable just get their own subscriber.
+                        try:
+                            subscriber = self._trigger_action_subscribers.get(
+                                event_filter
+                            )
+                            hashable = True
+                        except TypeError:
+                            subscriber = None
+                            hashable = False
+                        if subscriber is None:
+                            subscriber = _TriggerActionSubscriber(self, event_filter)
+                            if hashable:
+                                self._trigger_action_subscribers[
+                                    event_filter
+                                ] = subscriber
+                        subscriber.targets.append(
+                            (job, condition, trigger_action.action)
+                        )
 
                         # TODO we should consider throwing an exception if the topic
                         #  does not already exist (otherwise there's actually no point
                         #  in breaking out this create_job_subscriptions into a separate
                         #  function)
-                        self._event_log.subscribe(
-                            event_filter.topic_names_to_subscribe(), subscriber
-                        )
+                        self._event_log.subscribe(subscriber.topic_names, subscriber)
 
                         # TODO would be nice to somehow get the dynamically subscribed
                         #  "topics" into all_subscribed_topics as well somehow...
 
-                        job.all_subscribed_topics.extend(
-                            event_filter.topic_names_to_subscribe()
+                        all_subscribed_topics.update(
+                            dict.fromkeys(subscriber.topic_names)
                         )
-                job.all_subscribed_topics.extend(condition.topic_names_to_query())
+                all_subscribed_topics.update(
+                    dict.fromkeys(condition.topic_names_to_query())
+                )
+            job.all_subscribed_topics = tuple(all_subscribed_topics)
         self._create_job_subscriptions_queue.clear()
 
     def add_jobs(self, jobs: Iterable[Job]) -> None:
@@ -344,51 +378,58 @@ class Scheduler:
         self._event_log.append_event(scope.topic_name(), scope)
 
     async def _process_effects(
-        self, low_timestamp: Timestamp, high_timestamp: Timestamp, events: List[Event]
+        self,
+        low_timestamp: Timestamp,
+        high_timestamp: Timestamp,
+        events: List[Event[JobPayload]],
     ) -> None:
         """
-        Should get called for all events. Idea is to react to effects in Job-related
-        events
+        Should get called for all events with a JobPayload. Idea is to react to effects
+        in Job-related events
         """
 
         futures: List[Awaitable] = []
 
         # we want to iterate through events oldest first
         for event in reversed(events):
-            if isinstance(event.payload, JobPayload):
-                if event.payload.state == "SUCCEEDED":
-                    # Adding jobs and instantiating scopes isn't a normal effect in
-                    # terms of getting added to meadowflow.effects (that would be weird
-                    # because they would only get "actioned" after the job completes).
-                    # Instead, they get returned by the function but it makes sense to
-                    # process them here as well. So here we check if results is Job,
-                    # ScopeValues, or a list/tuple of those, and add them to the
-                    # scheduler
-
-                    result_type, result = _get_jobs_or_scopes_from_result(
-                        event.payload.result_value
+            if event.payload.state in ("RUN_REQUESTED", "RUNNING"):
+                self._active_job_names.add(event.topic_name)
+                # wake up the poll loop if it's idle
+                self._job_run_requested.set()
+            else:
+                self._active_job_names.discard(event.topic_name)
+
+            if event.payload.state == "SUCCEEDED":
+                # Adding jobs and instantiating scopes isn't a normal effect in
+                # terms of getting added to meadowflow.effects (that would be weird
+                # because they would only get "actioned" after the job completes).
+                # Instead, they get returned by the function but it makes sense to
+                # process them here as well. So here we check if results is Job,
+                # ScopeValues, or a list/tuple of those, and add them to the
+                # scheduler
+
+                result_type, result = _get_jobs_or_scopes_from_result(
+                    event.payload.result_value
+                )
+                if result_type == "jobs":
+                    self.add_jobs(result)
+                elif result_type == "scopes":
+                    for scope in result:
+                        self.instantiate_scope(scope)
+                elif result_type == "none":
+                    pass
+                else:
+                    raise ValueError(
+                        "Internal error, got an unexpected result_type "
+                        f"{result_type}"
                     )
-                    if result_type == "jobs":
-                        self.add_jobs(result)
-                    elif result_type == "scopes":
-                        for scope in result:
-                            self.instantiate_scope(scope)
-                    elif result_type == "none":
-                        pass
-                    else:
-                        raise ValueError(
-                            "Internal error, got an unexpected result_type "
-                            f"{result_type}"
-                        )
 
-                    # Now process meadowdb_effects
-                    # TODO Some effects (i.e. writes) should probably still be processed
-                    #  even if the job was not successful.
-                    futures.extend(
-                        self._process_meadowdb_effects(
-                            event, low_timestamp, high_timestamp
-                        )
-                    )
+                # Now process meadowdb_effects
+                # TODO Some effects (i.e. writes) should probably still be processed
+                #  even if the job was not successful.
+                futures.extend(
+                    self._process_meadowdb_effects(event, low_timestamp, high_timestamp)
+                )
 
         await asyncio.gather(*futures)
 
@@ -402,12 +443,11 @@ class Scheduler:
         Processes the MeadowdbEffects on event (if any). Updates
         MeadowdbDependencyActions. For reads, we find the current event's
         MeadowdbDependencyAction (if it exists) via _meadowdb_dependencies_name and
-        update its latest_tables_read. For writes, we find any MeadowdbDependencyActions
-        that depend on the current event's job's scope (or ALL_SCOPES) via
-        _meadowdb_dependencies_scopes and triggers those actions if they read the table
-        we wrote to. Remember that _meadowdb_dependencies_scopes and
-        _meadowdb_dependencies_names refer to the same MeadowdbDependencyAction objects.
-        Returns the futures created from executing the actions (if any).
+        update its latest_tables_read (and _meadowdb_dependencies_table). For writes, we
+        find the MeadowdbDependencyActions that read the tables we wrote to via
+        _meadowdb_dependencies_table and trigger the ones that depend on the current
+        event's job's scope (or ALL_SCOPES). Returns the futures created from executing
+        the actions (if any).
         """
         # TODO this implementation is probably overly simplistic. Consider scenarios:
         # J, K, L are jobs, T, U are tables
@@ -429,12 +469,15 @@ class Scheduler:
         # T"/"K wrote to T before J read T", and "J finishes before K"/"K finishes
         # before J" are possible.
 
-        if event.payload.effects is not None:
-            writes = set(
+        # if no jobs have dynamic meadowdb dependencies, there's nothing to update or
+        # trigger, so don't bother looking at the effects at all
+        if event.payload.effects is not None and self._meadowdb_dependencies_name:
+            meadowdb_effects = event.payload.effects.meadowdb_effects
+            writes = {
                 (conn, table)
-                for conn, effects in event.payload.effects.meadowdb_effects.items()
-                for table in effects.tables_written.keys()
-            )
+                for conn, effects in meadowdb_effects.items()
+                for table in effects.tables_written
+            }
 
             # If a job has a dynamic meadowdb dependency and it just ran, we need to
             # update its latest_tables_read to be whatever it just read. Importantly, we
@@ -442,56 +485,61 @@ class Scheduler:
             # in an infinite loop.
             # TODO figure out how to detect and stop(?) longer cycles (A -> B -> A)
             if event.topic_name in self._meadowdb_dependencies_name:
-                reads = set(
+                reads = {
                     (conn, table)
-                    for conn, effects in event.payload.effects.meadowdb_effects.items()
-                    for table in effects.tables_read.keys()
+                    for conn, effects in meadowdb_effects.items()
+                    for table in effects.tables_read
                     if (conn, table) not in writes
-                )
+                }
                 if len(reads) == 0:
                     # TODO this should probably do more than just warn
-                    print(
-                        f"Job {event.topic_name} with dynamic meadowdb dependencies "
-                        "did not read any meadowdb tables, dynamic dependencies will "
-                        "not be triggered again until the job is rerun"
+                    logging.warning(
+                        "Job %s with dynamic meadowdb dependencies did not read any "
+                        "meadowdb tables, dynamic dependencies will not be triggered "
+                        "again until the job is rerun",
+                        event.topic_name,
                     )
-                self._meadowdb_dependencies_name[
-                    event.topic_name
-                ].latest_tables_read = reads
+                dependency_action = self._meadowdb_dependencies_name[event.topic_name]
+                previous_reads = dependency_action.latest_tables_read or set()
+                for table in previous_reads - reads:
+                    names = self._meadowdb_dependencies_table[table]
+                    names.discard(event.topic_name)
+                    if not names:
+                        del self._meadowdb_dependencies_table[table]
+                for table in reads - previous_reads:
+                    self._meadowdb_dependencies_table.setdefault(table, set()).add(
+                        event.topic_name
+                    )
+                dependency_action.latest_tables_read = reads
 
             # now trigger jobs based on writes, check both this event's job's scopes and
-            # ALL_SCOPES
-            if writes:
-                dependencies_to_check = []
+            # ALL_SCOPES. If no dependencies have read any tables yet, none of them can
+            # be triggered.
+            if writes and self._meadowdb_dependencies_table:
+                names_to_check: Set[TopicName] = set()
+                for table in writes:
+                    names_to_check.update(
+                        self._meadowdb_dependencies_table.get(table, ())
+                    )
+
                 # TODO what if the job has been removed or changed while it's been
                 #  running?
                 job_scope = self._jobs[event.topic_name].scope
-                if job_scope in self._meadowdb_dependencies_scope:
-                    dependencies_to_check.append(
-                        self._meadowdb_dependencies_scope[job_scope]
-                    )
-                # job_scope should never be ALL_SCOPES, so no need to check for
-                # redundancy here
-                if ALL_SCOPES in self._meadowdb_dependencies_scope:
-                    dependencies_to_check.append(
-                        self._meadowdb_dependencies_scope[ALL_SCOPES]
-                    )
-
-                for meadowdb_dependency in itertools.chain(*dependencies_to_check):
-                    if (
-                        meadowdb_dependency.latest_tables_read is not None
-                        and meadowdb_dependency.latest_tables_read.intersection(writes)
+                for name in names_to_check:
+                    meadowdb_dependency = self._meadowdb_dependencies_name[name]
+                    if meadowdb_dependency.dependency_scope in (
+                        job_scope,
+                        ALL_SCOPES,
                     ) and meadowdb_dependency.state_predicate.apply(
                         self._event_log,
                         low_timestamp,
                         high_timestamp,
                         meadowdb_dependency.job.name,
                     ):
-                        yield meadowdb_dependency.action.execute(
+                        yield self._execute_action(
+                            meadowdb_dependency.action,
                             meadowdb_dependency.job,
                             None,
-                            self._job_runners,
-                            self._event_log,
                             high_timestamp,
                         )
 
@@ -515,12 +563,8 @@ class Scheduler:
     ) -> str:
         """Returns the request_id (see Run.execute for semantics of request_id)"""
         try:
-            return await action.execute(
-                topic,
-                overrides,
-                self._job_runners,
-                self._event_log,
-                self._event_log.next_timestamp,
+            return await self._execute_action(
+                action, topic, overrides, self._event_log.next_timestamp
             )
         except Exception as e:
             # TODO this function isn't awaited, so exceptions need to make it back into
@@ -530,27 +574,90 @@ class Scheduler:
             # that case, we shouldn't be getting here
             return f"Unexpected error: {str(e)}"
 
+    async def _execute_action(
+        self,
+        action: Action,
+        topic: Topic,
+        overrides: Optional[JobRunOverrides],
+        timestamp: Timestamp,
+    ) -> str:
+        """
+        All actions should be executed via this function. Run.execute creates the
+        RUN_REQUESTED event before it has submitted the job to a job runner, and a job
+        runner can't tell us anything about a job before it's been submitted. So while
+        an action is executing on a job, _get_running_and_requested_jobs won't return
+        that job if it's in RUN_REQUESTED, and we wake up the poll loop once the action
+        is done.
+        """
+        self._executing_action_counts[topic.name] = (
+            self._executing_action_counts.get(topic.name, 0) + 1
+        )
+        try:
+            return await action.execute(
+                topic, overrides, self._job_runners, self._event_log, timestamp
+            )
+        finally:
+            count = self._executing_action_counts[topic.name] - 1
+            if count:
+                self._executing_action_counts[topic.name] = count
+            else:
+                del self._executing_action_counts[topic.name]
+            self._job_run_requested.set()
+
     def _get_running_and_requested_jobs(self) -> Iterable[Event[JobPayload]]:
         """
-        Returns the latest event for any job that's in RUN_REQUESTED or RUNNING state
+        Returns the latest event for any job that's in RUN_REQUESTED or RUNNING state,
+        except for RUN_REQUESTED jobs that are still being submitted (see
+        _execute_action).
+
+        Only considers jobs in _active_job_names, so a job that has just been requested
+        but hasn't been processed by _process_effects yet will get picked up on the next
+        call. We still check the latest event in the event log for each of these jobs so
+        that we don't return stale events for jobs that have already finished.
         """
         timestamp = self._event_log.next_timestamp
-        for name in self._jobs.keys():
+        for name in self._active_job_names:
             ev = self._event_log.last_event(name, timestamp)
-            if ev and ev.payload.state in ("RUN_REQUESTED", "RUNNING"):
+            if ev and (
+                ev.payload.state == "RUNNING"
+                or (
+                    ev.payload.state == "RUN_REQUESTED"
+                    and name not in self._executing_action_counts
+                )
+            ):
                 yield ev
 
     async def _call_poll_job_runners_loop(self) -> None:
-        """Periodically polls the job runners we know about"""
+        """
+        Periodically polls the job runners we know about. While no jobs are running,
+        waits for _process_effects to see a job get requested rather than polling. Once
+        jobs are running, polls quickly at first (so that short jobs get picked up
+        promptly) and backs off to job_runner_poll_delay_seconds.
+        """
         EXCEPTION_MESSAGE: Final = "Unexpected exception while polling jobs."
+        delay = min(
+            self._JOB_RUNNER_MIN_POLL_DELAY_SECONDS, self._job_runner_poll_delay_seconds
+        )
         while True:
             try:
+                # clear before we look at the event log so that a job that gets
+                # requested after this point is guaranteed to wake us up below
+                self._job_run_requested.clear()
+
                 # TODO should we keep track of which jobs are running on which job
                 #  runner and only poll for those jobs?
                 # -> yes, because if we can't reach a job runner, we need to be able
                 # to change the state of those jobs, i.e. publish an event that changes
                 # state to UNREACHABLE.
                 last_events = list(self._get_running_and_requested_jobs())
+                if not last_events:
+                    await self._job_run_requested.wait()
+                    delay = min(
+                        self._JOB_RUNNER_MIN_POLL_DELAY_SECONDS,
+                        self._job_runner_poll_delay_seconds,
+                    )
+                    continue
+
                 results = await asyncio.gather(
                     *[jr.poll_jobs(last_events) for jr in self._job_runners],
                     return_exceptions=True,
@@ -559,7 +666,8 @@ class Scheduler:
                     if result is not None:
                         logging.exception(EXCEPTION_MESSAGE, exc_info=result)
 
-                await asyncio.sleep(self._job_runner_poll_delay_seconds)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self._job_runner_poll_delay_seconds)
             except asyncio.CancelledError:
                 logging.info("Job runner poll loop cancelled.")
                 raise
@@ -599,9 +707,9 @@ class Scheduler:
         Returns true if everything is in a "waiting" state. I.e. no jobs are running,
         all subscribers have been processed.
         """
-        return self._event_log.all_subscribers_called() and not any(
-            True for _ in self._get_running_and_requested_jobs()
-        )
+        # once all subscribers have been called, _process_effects has seen every event,
+        # so _active_job_names is exactly the set of running/requested jobs
+        return self._event_log.all_subscribers_called() and not self._active_job_names
 
     def events_of(self, topic_name: TopicName) -> List[Event]:
         """For unit tests/debugging"""
@@ -3,12 +3,12 @@
 import asyncio
 import contextlib
 import logging
-import multiprocessing
 from typing import Iterator, Optional
 
 import meadowflow.server.server
 from meadowflow.scheduler import Scheduler
 from meadowflow.server.config import DEFAULT_HOST, DEFAULT_PORT
+from meadowgrid.shared import run_in_child_process
 
 
 async def start(host: str, port: int, job_runner_poll_delay_seconds: float) -> None:
@@ -38,23 +38,8 @@ def main_in_child_process(
     logs, etc. If there's an existing server already running, the child process will
     just die immediately without doing anything.
     """
-    ctx = multiprocessing.get_context("spawn")
-    server_process = ctx.Process(
-        target=main, args=(host, port, job_runner_poll_delay_seconds)
-    )
-    server_process.start()
-
-    try:
-        logging.info(f"Process started. Pid: {server_process.pid}")
-        yield server_process.pid
-    finally:
-        server_process.terminate()
-        logging.info("Process terminated. Waiting up to 5 seconds for exit...")
-        server_process.join(5)
-        logging.info(f"Process exited with code {server_process.exitcode}")
-        if server_process.is_alive():
-            logging.info("Process alive after termination, killing.")
-            server_process.kill()
+    with run_in_child_process(main, (host, port, job_runner_poll_delay_seconds)) as pid:
+        yield pid
 
 
 def command_line_main() -> None:
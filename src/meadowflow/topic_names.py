@@ -51,6 +51,17 @@ class FrozenDict(Mapping[TK, TV]):
         self._d: Dict[TK, TV] = dict(*args, **kwargs)
         self._hash: Optional[int] = None
 
+    @classmethod
+    def from_dict(cls, d: Dict[TK, TV]) -> FrozenDict[TK, TV]:
+        """
+        Like FrozenDict(d), but uses d directly instead of copying it. The caller must
+        not modify d afterwards.
+        """
+        result = cls.__new__(cls)
+        result._d = d
+        result._hash = None
+        return result
+
     def __iter__(self) -> Iterator[TK]:
         return iter(self._d)
 
@@ -1,8 +1,8 @@
 from __future__ import annotations
 
 import abc
-import collections
-from typing import Literal, Optional, Dict
+import dataclasses
+from typing import Literal, Optional, Dict, Tuple, cast
 
 import numpy as np
 import pandas as pd
@@ -30,6 +30,15 @@ class AgentCreator(abc.ABC):
         """
         pass
 
+    def get_instance_types_cached(self) -> Optional[pd.DataFrame]:
+        """
+        Returns the same thing as get_instance_types if that's available without having
+        to wait, otherwise returns None, in which case callers should fall back to
+        get_instance_types. This avoids going through the event loop when
+        get_instance_types would just return an already loaded DataFrame.
+        """
+        return None
+
     @abc.abstractmethod
     async def launch_job_specific_agent(
         self,
@@ -51,97 +60,181 @@ class AgentCreator(abc.ABC):
 
     # TODO we need to have a way to kill agents when we're done with them
 
+    # (instance_types, cached _prepare_instance_types results) for the instance_types
+    # DataFrame most recently passed to choose_instance_types_for_job
+    _prepared_instance_types: Optional[
+        Tuple[pd.DataFrame, _PreparedInstanceTypes]
+    ] = None
 
-def choose_instance_types_for_job(
-    resources_required: meadowgrid.resource_allocation.Resources,
-    num_workers_to_allocate: int,
-    interruption_probability_threshold: float,
-    instance_types: pd.DataFrame,
-) -> pd.DataFrame:
+    def choose_instance_types_for_job(
+        self,
+        resources_required: meadowgrid.resource_allocation.Resources,
+        num_workers_to_allocate: int,
+        interruption_probability_threshold: float,
+        instance_types: pd.DataFrame,
+    ) -> pd.DataFrame:
+        """
+        Same as the module-level choose_instance_types_for_job, but caches intermediate
+        results. instance_types should come from get_instance_types, which usually
+        returns the same DataFrame for many jobs. When it returns a different DataFrame
+        (i.e. the instance types were refreshed), we replace the whole cache.
+        instance_types should not be modified after it has been passed to this method.
+        """
+        if (
+            self._prepared_instance_types is None
+            or self._prepared_instance_types[0] is not instance_types
+        ):
+            self._prepared_instance_types = (instance_types, {})
+
+        return _choose_instance_types_for_job(
+            resources_required,
+            num_workers_to_allocate,
+            interruption_probability_threshold,
+            instance_types,
+            self._prepared_instance_types[1],
+        )
+
+
+@dataclasses.dataclass
+class _InstanceTypeArrays:
+    """
+    The subset of an instance_types DataFrame (see choose_instance_types_for_job) that
+    can be used for a particular job, stored as one numpy array per column. All of the
+    arrays line up with each other.
     """
-    This chooses how many of which instance types we should launch for a job with 1 or
-    more tasks where each task requires resources_required so that num_tasks_to_allocate
-    tasks can run in parallel. We choose the cheapest instances that have interruption
-    probability lower than or equal to the specified threshold. If you only want to use
-    on-demand instances that have 0 probability of interruption, you can set
-    interruption_probability_threshold to 0. If there are multiple instances that are
-    the cheapest, we choose the ones that have the lowest interruption probability. If
-    there are still multiple instances, then we diversify among those instance types (it
-    seems that interruptions are more likely to happen at the same time on the same
-    instance types).
 
-    instance_types should be a dataframe with these columns:
-    - instance_type: str, e.g. t2.micro
-    - memory_gb: float, e.g. 4 means 4 GiB
-    - logical_cpu: int, e.g. 2 means 2 logical (aka virtual) cpus
-    - price: float, e.g. 0.023 means 0.023 USD per hour to run the instance
-    - interruption_probability: float, e.g. 0 for on-demand instances, >0 for spot
-      instances, as a percentage, so values range from 0 to 100.
-    - on_demand_or_spot: str, "on_demand" or "spot" (not used in this function)
+    # the positions (i.e. for iloc) of these instance types in instance_types
+    index: np.ndarray
+    workers_per_instance: np.ndarray
+    price: np.ndarray
+    interruption_probability: np.ndarray
+    # price / workers_per_instance, i.e. the price per worker if we can fully pack each
+    # instance
+    price_per_worker: np.ndarray
+    # workers_per_instance.max(), or 0 if there are no usable instance types
+    max_workers_per_instance: int
+    # caches the results of _allocate_workers for these instance types, keyed by
+    # num_workers_to_allocate
+    allocations: Dict[int, np.ndarray] = dataclasses.field(default_factory=dict)
 
-    returns a dataframe with the same schema as instance_types, with additional columns:
-    - num_instances: e.g. 5 means we should allocate 5 of these instances
-    - workers_per_instance: how many workers should be able to run on that instance
-    Rows (i.e. instance types) will only be present if num_instances is at least 1.
 
-    TODO we should maybe have an option where e.g. if you want to allocate 53 workers
-     worth of capacity for a 100-task job, it makes more sense to allocate e.g. 55 or 60
-     workers worth of capacity rather than allocating a little machine for the last 3
-     workers of capacity
+# Cached results of _prepare_instance_types for a single instance_types DataFrame, keyed
+# by (memory_gb, logical_cpu, interruption_probability_threshold). See
+# AgentCreator.choose_instance_types_for_job
+_PreparedInstanceTypes = Dict[Tuple[float, int, float], _InstanceTypeArrays]
+# The maximum number of results we keep per instance_types DataFrame. The oldest result
+# gets evicted first.
+_MAX_PREPARED_PER_INSTANCE_TYPES = 32
+# The maximum number of _allocate_workers results we keep per _InstanceTypeArrays. The
+# oldest result gets evicted first.
+_MAX_ALLOCATIONS_PER_PREPARED = 32
+
+
+def _prepare_instance_types(
+    instance_types: pd.DataFrame,
+    memory_gb_required: float,
+    logical_cpu_required: int,
+    interruption_probability_threshold: float,
+    cached_results: Optional[_PreparedInstanceTypes],
+) -> _InstanceTypeArrays:
+    """
+    Gets the instance types in instance_types that can be used for a job with the
+    specified requirements, along with how many workers we can fit on each instance
+    type.
+
+    The same instance_types is usually used for many jobs, which often have the same
+    requirements, so if cached_results is provided, results are cached there.
+    cached_results must only ever be used with the same instance_types.
     """
+    key = (memory_gb_required, logical_cpu_required, interruption_probability_threshold)
 
-    # make a copy of instance_types, as we want to modify it in place
-    instance_types = instance_types.copy()
+    if cached_results is not None and key in cached_results:
+        return cached_results[key]
+
+    # the maximum number of workers we could pack onto each instance type, i.e.
+    # floor(min(memory_gb / memory_gb_required, logical_cpu / logical_cpu_required)).
+    # Taking the floor after the minimum is equivalent and saves a pass. We don't use
+    # floor division (//) because for floats it can be off by one compared to floor(a /
+    # b), e.g. 1.0 // 0.1 == 9.0
+    workers_per_instance = instance_types["memory_gb"].to_numpy() / memory_gb_required
+    np.minimum(
+        workers_per_instance,
+        instance_types["logical_cpu"].to_numpy() / logical_cpu_required,
+        out=workers_per_instance,
+    )
+    workers_per_instance = np.floor(
+        workers_per_instance, out=workers_per_instance
+    ).astype(np.int64)
 
     # ignore anything with a higher interruption probability than what we want to
-    # tolerate
-    instance_types = instance_types[
-        instance_types["interruption_probability"] <= interruption_probability_threshold
-    ]
-
-    # the maximum number of workers we could pack onto each instance type
-    instance_types["workers_per_instance"] = np.minimum(
-        np.floor(instance_types["memory_gb"] / resources_required.memory_gb),
-        np.floor(instance_types["logical_cpu"] / resources_required.logical_cpu),
-    ).astype(int)
-    # ignore instance types where we won't be able to fit even 1 worker
-    instance_types = instance_types[instance_types["workers_per_instance"] >= 1]
-    # if we get the maximum number of workers packed onto the instance type, what is our
-    # effective price per worker
-    instance_types["price_per_worker"] = (
-        instance_types["price"] / instance_types["workers_per_instance"]
+    # tolerate, and ignore instance types where we won't be able to fit even 1 worker
+    interruption_probability = instance_types["interruption_probability"].to_numpy()
+    index = np.flatnonzero(
+        (interruption_probability <= interruption_probability_threshold)
+        & (workers_per_instance >= 1)
+    )
+
+    workers_per_instance = workers_per_instance[index]
+    price = instance_types["price"].to_numpy()[index]
+    result = _InstanceTypeArrays(
+        index,
+        workers_per_instance,
+        price,
+        interruption_probability[index],
+        price / workers_per_instance,
+        int(workers_per_instance.max(initial=0)),
     )
 
-    instance_types = instance_types.reset_index(drop=True)
-    # This will keep track of how many of which instance type to use. E.g. {34: 5} tells
-    # us to use 5 instances of the instance_types.loc[34] instance type
-    instance_types_to_use: Dict[int, int] = collections.defaultdict(lambda: 0)
+    if cached_results is not None:
+        if len(cached_results) >= _MAX_PREPARED_PER_INSTANCE_TYPES:
+            del cached_results[next(iter(cached_results))]
+        cached_results[key] = result
+
+    return result
+
+
+def _allocate_workers(
+    arrays: _InstanceTypeArrays, num_workers_to_allocate: int
+) -> np.ndarray:
+    """
+    The core of choose_instance_types_for_job. Returns an array that lines up with the
+    arrays in arrays which has the number of instances of each instance type to use.
+
+    This only does arithmetic on numpy arrays/scalars, no pandas, so that it stays cheap
+    even when it gets called for every job.
+    """
+    workers_per_instance = arrays.workers_per_instance
+    interruption_probability = arrays.interruption_probability
 
-    while num_workers_to_allocate > 0:
-        best = instance_types.copy()
+    # This will keep track of how many of which instance type to use. E.g.
+    # instance_types_to_use[34] == 5 tells us to use 5 instances of the instance type at
+    # position 34 in the arrays
+    instance_types_to_use = np.zeros(len(workers_per_instance), dtype=np.int64)
 
+    while num_workers_to_allocate > 0 and len(workers_per_instance) > 0:
         # for larger instances, there might not be enough num_workers_to_allocate to
         # make it "worth it" to use that larger instance because we won't have enough
         # workers to fully pack the instance. So we recompute price_per_worker for those
         # instances assuming we only get to put num_workers_to_allocate on that
-        # instance.
-        too_large_index = (
-            instance_types["workers_per_instance"] > num_workers_to_allocate
-        )
-        best.loc[too_large_index, "price_per_worker"] = (
-            best.loc[too_large_index, "price"] / num_workers_to_allocate
-        )
+        # instance. If num_workers_to_allocate is at least as large as every instance
+        # type, we can just use the precomputed price_per_worker.
+        if num_workers_to_allocate >= arrays.max_workers_per_instance:
+            price_per_worker = arrays.price_per_worker
+        else:
+            price_per_worker = arrays.price / np.minimum(
+                workers_per_instance, num_workers_to_allocate
+            )
 
         # Now find the instance types that have the lowest price per worker. If there
         # are multiple instance types that have the same price per worker (or are within
         # half a penny per hour), then take the ones that have the lowest probability of
         # interruption (within 1%)
         # TODO maybe the rounding should be configurable?
-        best = best[(best["price_per_worker"] - best["price_per_worker"].min()) < 0.005]
-        best = best[
-            (best["interruption_probability"] - best["interruption_probability"].min())
-            < 1
-        ]
+        cheapest = price_per_worker - price_per_worker.min() < 0.005
+        best = np.flatnonzero(
+            cheapest
+            & (interruption_probability - interruption_probability[cheapest].min() < 1)
+        )
 
         # At this point, best is the set of instance types that are the cheapest and
         # least interruption-likely for our workload. Next, we'll make sure to take one,
@@ -153,12 +246,16 @@ def choose_instance_types_for_job(
         # https://docs.aws.amazon.com/AWSEC2/latest/UserGuide/spot-fleet-allocation-strategy.html
 
         # iterating from largest to smallest will make things easier
-        best = best.sort_values(["workers_per_instance"], ascending=False)
+        best = best[np.argsort(-workers_per_instance[best], kind="stable")]
 
         # take the first one no matter what
         i = 0
-        instance_types_to_use[best.index[i]] += 1
-        num_workers_to_allocate -= best.loc[best.index[i], "workers_per_instance"]
+        instance_types_to_use[best[i]] += 1
+        num_workers_to_allocate -= workers_per_instance[best[i]]
+        if num_workers_to_allocate <= 0:
+            # the common case for small jobs is that a single instance is enough, in
+            # which case there's no point in doing any of the work below
+            break
 
         # Now that we've decreased num_workers_to_allocate, we need to make sure
         # price_per_worker is still accurate (i.e. num_workers_to_allocate could have
@@ -167,17 +264,121 @@ def choose_instance_types_for_job(
         # in a round-robin-ish fashion. Once there are no more instance types where
         # price_per_worker is still accurate, we'll go through the loop again and
         # recompute price_per_worker.
+
+        # First, a full round-robin "sweep" allocates one instance of each type in
+        # best, so we can compute how many full sweeps we can do in one step rather than
+        # allocating one instance at a time
+        best = best[workers_per_instance[best] <= num_workers_to_allocate]
+        if len(best) > 0:
+            workers_per_sweep = workers_per_instance[best].sum()
+            num_sweeps = num_workers_to_allocate // workers_per_sweep
+            if num_sweeps > 0:
+                instance_types_to_use[best] += num_sweeps
+                num_workers_to_allocate -= num_sweeps * workers_per_sweep
+
+        # Then allocate the remainder one instance at a time. This is less than one
+        # sweep's worth of instances, so we use plain Python ints rather than going
+        # through numpy for every step
+        candidates = list(zip(best.tolist(), workers_per_instance[best].tolist()))
         while True:
-            best = best[best["workers_per_instance"] <= num_workers_to_allocate]
-            if len(best) == 0:
+            candidates = [c for c in candidates if c[1] <= num_workers_to_allocate]
+            if len(candidates) == 0:
                 break
-            # this is...very inexact because best is changing as we iterate, but the
-            # idea is to walk through the options in best one by one
-            i = (i + 1) % len(best)
-            instance_types_to_use[best.index[i]] += 1
-            num_workers_to_allocate -= best.loc[best.index[i], "workers_per_instance"]
-
-    # relies on defaultdict.keys() and .values() iterating in the same order
-    return instance_types.loc[instance_types_to_use.keys()].assign(
-        num_instances=instance_types_to_use.values()
+            # this is...very inexact because candidates is changing as we iterate, but
+            # the idea is to walk through the options in best one by one
+            i = (i + 1) % len(candidates)
+            index, workers = candidates[i]
+            instance_types_to_use[index] += 1
+            num_workers_to_allocate -= workers
+
+    return instance_types_to_use
+
+
+def choose_instance_types_for_job(
+    resources_required: meadowgrid.resource_allocation.Resources,
+    num_workers_to_allocate: int,
+    interruption_probability_threshold: float,
+    instance_types: pd.DataFrame,
+) -> pd.DataFrame:
+    """
+    This chooses how many of which instance types we should launch for a job with 1 or
+    more tasks where each task requires resources_required so that num_tasks_to_allocate
+    tasks can run in parallel. We choose the cheapest instances that have interruption
+    probability lower than or equal to the specified threshold. If you only want to use
+    on-demand instances that have 0 probability of interruption, you can set
+    interruption_probability_threshold to 0. If there are multiple instances that are
+    the cheapest, we choose the ones that have the lowest interruption probability. If
+    there are still multiple instances, then we diversify among those instance types (it
+    seems that interruptions are more likely to happen at the same time on the same
+    instance types).
+
+    instance_types should be a dataframe with these columns:
+    - instance_type: str, e.g. t2.micro
+    - memory_gb: float, e.g. 4 means 4 GiB
+    - logical_cpu: int, e.g. 2 means 2 logical (aka virtual) cpus
+    - price: float, e.g. 0.023 means 0.023 USD per hour to run the instance
+    - interruption_probability: float, e.g. 0 for on-demand instances, >0 for spot
+      instances, as a percentage, so values range from 0 to 100.
+    - on_demand_or_spot: str, "on_demand" or "spot" (not used in this function)
+
+    returns a dataframe with the same schema as instance_types, with additional columns:
+    - num_instances: e.g. 5 means we should allocate 5 of these instances
+    - workers_per_instance: how many workers should be able to run on that instance
+    Rows (i.e. instance types) will only be present if num_instances is at least 1.
+
+    See also AgentCreator.choose_instance_types_for_job, which caches intermediate
+    results per instance_types DataFrame.
+
+    TODO we should maybe have an option where e.g. if you want to allocate 53 workers
+     worth of capacity for a 100-task job, it makes more sense to allocate e.g. 55 or 60
+     workers worth of capacity rather than allocating a little machine for the last 3
+     workers of capacity
+    """
+    return _choose_instance_types_for_job(
+        resources_required,
+        num_workers_to_allocate,
+        interruption_probability_threshold,
+        instance_types,
+        None,
+    )
+
+
+def _choose_instance_types_for_job(
+    resources_required: meadowgrid.resource_allocation.Resources,
+    num_workers_to_allocate: int,
+    interruption_probability_threshold: float,
+    instance_types: pd.DataFrame,
+    cached_results: Optional[_PreparedInstanceTypes],
+) -> pd.DataFrame:
+    """
+    See choose_instance_types_for_job. If cached_results is provided, intermediate
+    results are cached there, see _prepare_instance_types.
+    """
+
+    # Everything below works on numpy arrays rather than on instance_types directly, as
+    # filtering/copying a DataFrame on every iteration is very slow
+    arrays = _prepare_instance_types(
+        instance_types,
+        resources_required.memory_gb,
+        resources_required.logical_cpu,
+        interruption_probability_threshold,
+        cached_results,
     )
+    # Many jobs have the same requirements and number of workers, so we cache the
+    # allocations. The returned DataFrame is constructed fresh every time so that
+    # callers can't modify the cached results.
+    instance_types_to_use = arrays.allocations.get(num_workers_to_allocate)
+    if instance_types_to_use is None:
+        instance_types_to_use = _allocate_workers(arrays, num_workers_to_allocate)
+        if len(arrays.allocations) >= _MAX_ALLOCATIONS_PER_PREPARED:
+            del arrays.allocations[next(iter(arrays.allocations))]
+        arrays.allocations[num_workers_to_allocate] = instance_types_to_use
+
+    chosen = np.flatnonzero(instance_types_to_use)
+    # take gives us a new DataFrame that isn't a view on instance_types, so we can add
+    # columns to it in place (assign would make another copy)
+    result = cast(pd.DataFrame, instance_types.take(arrays.index[chosen]))
+    result["workers_per_instance"] = arrays.workers_per_instance[chosen]
+    result["price_per_worker"] = arrays.price_per_worker[chosen]
+    result["num_instances"] = instance_types_to_use[chosen]
+    return result
@@ -2,11 +2,11 @@ import argparse
 import asyncio
 import contextlib
 import logging
-import multiprocessing
 from typing import Iterator, Optional, Dict
 
 import meadowgrid.agent
 from meadowgrid.config import DEFAULT_COORDINATOR_HOST, DEFAULT_COORDINATOR_PORT
+from meadowgrid.shared import run_in_child_process
 
 
 def main(
@@ -51,10 +51,9 @@ def main_in_child_process(
     logs, etc. If there's an existing agent already running, the child process will
     just die immediately without doing anything.
     """
-    ctx = multiprocessing.get_context("spawn")
-    server_process = ctx.Process(
-        target=main,
-        args=(
+    with run_in_child_process(
+        main,
+        (
             working_folder,
             available_resources,
             coordinator_host,
@@ -62,20 +61,8 @@ def main_in_child_process(
             agent_id,
             job_id,
         ),
-    )
-    server_process.start()
-
-    try:
-        logging.info(f"Process started. Pid: {server_process.pid}")
-        yield server_process.pid
-    finally:
-        server_process.terminate()
-        logging.info("Process terminated. Waiting up to 5 seconds for exit...")
-        server_process.join(5)
-        logging.info(f"Process exited with code {server_process.exitcode}")
-        if server_process.is_alive():
-            logging.info("Process alive after termination, killing.")
-            server_process.kill()
+    ) as pid:
+        yield pid
 
 
 def command_line_main() -> None:
@@ -97,16 +84,18 @@ def command_line_main() -> None:
     args = parser.parse_args()
 
     available_resources: Dict[str, float] = {}
+    invalid_resources = []
     if args.available_resource:
         for name, value in args.available_resource:
             try:
-                value = float(value)
+                available_resources[name] = float(value)
             except ValueError:
-                raise ValueError(
-                    "For --available-resource [name] [value], value must be a float"
-                )
-
-            available_resources[name] = value
+                invalid_resources.append(f"{name} {value}")
+    if invalid_resources:
+        raise ValueError(
+            "For --available-resource [name] [value], value must be a float, got: "
+            + ", ".join(invalid_resources)
+        )
 
     main(
         args.working_folder,
@@ -2,39 +2,73 @@ from __future__ import annotations
 
 import asyncio
 import base64
+import concurrent.futures
 import dataclasses
 import datetime
-import json
+import functools
+import itertools
+import os
 import threading
+import time
 import traceback
 from types import TracebackType
 from typing import (
     Any,
+    AsyncContextManager,
+    Awaitable,
     Dict,
     Generator,
     Iterable,
+    List,
+    Literal,
     Optional,
     Sequence,
+    Set,
+    TYPE_CHECKING,
     Tuple,
     Type,
     TypeVar,
+    cast,
 )
 
+import aiobotocore.session
 import aiohttp
 import aiohttp.client_exceptions
 import boto3
+import botocore.config
+import botocore.exceptions
+import numpy as np
 import pandas as pd
 
+try:
+    # orjson is optional, but it's much faster than json for parsing the thousands of
+    # products we get from the pricing API
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
 from meadowgrid.agent_creator import (
     AgentCreator,
     OnDemandOrSpotType,
     choose_instance_types_for_job,
 )
-from meadowgrid.config import DEFAULT_COORDINATOR_PORT, EC2_PRICES_UPDATE_SECS
+from meadowgrid.config import (
+    DEFAULT_COORDINATOR_PORT,
+    EC2_INSTANCE_TYPES_CACHE_SECS,
+    EC2_ON_DEMAND_PRICES_CACHE_SECS,
+    EC2_PRICES_UPDATE_SECS,
+    MEADOWGRID_REFRESH_EC2_ON_DEMAND_PRICES,
+)
 from meadowgrid.coordinator_client import MeadowGridCoordinatorClientAsync
-from meadowgrid.ec2_alloc_lambda.ec2_alloc_stub import ignore_boto3_error_code
+from meadowgrid.ec2_alloc_lambda.ec2_alloc_stub import (
+    ignore_boto3_error_code,
+    suppress_boto3_error_code,
+)
 from meadowgrid.resource_allocation import Resources
 
+if TYPE_CHECKING:
+    from types_aiobotocore_ec2.type_defs import TagTypeDef
+
 _MEADOWGRID_COORDINATOR_ROLE = "meadowgridCoordinatorRole"
 _MEADOWGRID_COORDINATOR_SECURITY_GROUP = "meadowgridCoordinatorSecurityGroup"
 _MEADOWGRID_AGENT_SECURITY_GROUP = "meadowgridAgentSecurityGroup"
@@ -70,15 +104,122 @@ _LAMBDA_ASSUME_ROLE_POLICY_DOCUMENT = """{
 
 _T = TypeVar("_T")
 
+# The maximum number of EC2 launch requests (each of which can be for many instances)
+# that launch_ec2_instances will have in flight at the same time
+_MAX_CONCURRENT_LAUNCHES = 16
+
+# The maximum number of get_products/describe_spot_price_history requests that
+# _get_ec2_on_demand_prices/_get_ec2_spot_prices will have in flight at the same time
+_MAX_CONCURRENT_PRICING_REQUESTS = 8
+
+# how often launch_meadowgrid_coordinator checks whether the coordinator is up
+_COORDINATOR_CHECK_INITIAL_DELAY_SECS = 0.1
+_COORDINATOR_CHECK_BACKOFF = 1.5
+_COORDINATOR_CHECK_MAX_DELAY_SECS = 5.0
+
+# how often we check whether spot instance requests have been fulfilled. The timeout
+# matches the spot_instance_request_fulfilled waiter's 40 attempts * 15 seconds
+_SPOT_REQUEST_CHECK_INITIAL_DELAY_SECS = 1.0
+_SPOT_REQUEST_CHECK_BACKOFF = 1.5
+_SPOT_REQUEST_CHECK_MAX_DELAY_SECS = 15.0
+_SPOT_REQUEST_WAIT_TIMEOUT_SECS = 600
+
+# Used for EC2 clients that make launch requests. When we make a lot of requests at
+# once, we'll get throttled by EC2, so we retry more times than the default
+_EC2_LAUNCH_CLIENT_CONFIG = botocore.config.Config(
+    retries={"mode": "standard", "max_attempts": 10}
+)
+
+_boto3_default_session_lock = threading.Lock()
+
+# where we cache EC2 prices, see _read_cached_dataframe
+_EC2_PRICES_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".meadowgrid", "cache")
+
+
+@functools.lru_cache(maxsize=None)
+def _get_boto3_client(
+    service_name: Literal["ec2", "iam", "pricing"], region_name: Optional[str] = None
+) -> Any:
+    """
+    Equivalent to boto3.client(service_name, region_name=region_name), but reuses
+    clients. Creating a client is relatively expensive, and reusing a client means we
+    can reuse its open connections rather than doing a new TLS handshake every time.
+
+    Clients are thread-safe once created, so this can be called from any thread.
+    """
+    # boto3's default session isn't thread-safe, so only create one client at a time
+    with _boto3_default_session_lock:
+        return boto3.client(service_name, region_name=region_name)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_boto3_resource(
+    service_name: Literal["ec2"], region_name: Optional[str] = None
+) -> Any:
+    """
+    Like _get_boto3_client but for boto3.resource. Unlike clients, resources are not
+    thread-safe, so these should only be used from the event loop's thread.
+    """
+    with _boto3_default_session_lock:
+        return boto3.resource(service_name, region_name=region_name)
+
 
 def _boto3_paginate(method: Any, **kwargs: Any) -> Iterable[Any]:
     paginator = method.__self__.get_paginator(method.__name__)
-    for page in paginator.paginate(**kwargs).result_key_iters():
-        for item in page:
-            yield item
+    # result_key_iters returns one iterator per result key (e.g. PriceList for
+    # get_products), each of which goes through all of the pages
+    for result_key_iter in paginator.paginate(**kwargs).result_key_iters():
+        yield from result_key_iter
+
+
+def _read_cached_dataframe(path: str, max_age_secs: float) -> Optional[pd.DataFrame]:
+    """
+    Returns the dataframe written to path by _write_cached_dataframe if it was written
+    less than max_age_secs ago, otherwise returns None
+    """
+    try:
+        if time.time() - os.path.getmtime(path) < max_age_secs:
+            return pd.read_parquet(path)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Warning, unable to read cached data from {path}: {e!r}")
+    return None
+
+
+def _write_cached_dataframe(path: str, df: pd.DataFrame) -> None:
+    """
+    Writes df to path as a parquet file. Errors are printed rather than raised, as the
+    cache is just an optimization.
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first so that readers never see a partial file
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        df.to_parquet(temp_path, index=False)
+        os.replace(temp_path, path)
+    except Exception as e:
+        print(f"Warning, unable to write cached data to {path}: {e!r}")
 
 
-async def _get_ec2_metadata(url_suffix: str) -> Optional[str]:
+def _http_get(
+    url: str,
+    http_session: Optional[aiohttp.ClientSession],
+    headers: Optional[Dict[str, str]] = None,
+) -> AsyncContextManager[aiohttp.ClientResponse]:
+    """
+    Makes a GET request using http_session if it's provided, which lets repeated
+    requests reuse connections. Otherwise, uses a one-off session.
+    """
+    if http_session is None:
+        return aiohttp.request("GET", url, headers=headers)
+    else:
+        return http_session.get(url, headers=headers)
+
+
+async def _get_ec2_metadata(
+    url_suffix: str, http_session: Optional[aiohttp.ClientSession] = None
+) -> Optional[str]:
     """
     Queries the EC2 metadata endpoint, which gives us information about the EC2 instance
     we're currently running on:
@@ -87,8 +228,8 @@ async def _get_ec2_metadata(url_suffix: str) -> Optional[str]:
     EC2 instance.
     """
     try:
-        async with aiohttp.request(
-            "GET", f"http://169.254.169.254/latest/meta-data/{url_suffix}"
+        async with _http_get(
+            f"http://169.254.169.254/latest/meta-data/{url_suffix}", http_session
         ) as response:
             return await response.text()
     except aiohttp.client_exceptions.ClientConnectorError:
@@ -99,19 +240,27 @@ async def _get_ec2_metadata(url_suffix: str) -> Optional[str]:
     return None
 
 
+# The region we're running in according to the EC2 metadata endpoint. This can't change
+# while we're running, so we only query it once (see _get_default_region_name)
+_ec2_metadata_region_name: Optional[str] = None
+
+
 async def _get_default_region_name() -> str:
     """
     Tries to get the default region name. E.g. us-east-2. First sees if the AWS CLI is
     set up, and returns the equivalent of `aws configure get region`. Then checks if we
     are running on an EC2 instance in which case we check the AWS metadata endpoint
     """
+    global _ec2_metadata_region_name
 
     default_session = boto3._get_default_session()
     if default_session is not None and default_session.region_name:
         # equivalent of `aws configure get region`
         return default_session.region_name
     else:
-        result = await _get_ec2_metadata("placement/region")
+        if _ec2_metadata_region_name is None:
+            _ec2_metadata_region_name = await _get_ec2_metadata("placement/region")
+        result = _ec2_metadata_region_name
         if result:
             return result
         else:
@@ -127,14 +276,10 @@ def _iam_role_exists(iam_client: Any, role_name: str) -> bool:
     try:
         iam_client.get_role(RoleName=role_name)
         return True
-    except Exception as e:
-        # Unfortunately boto3 appears to have dynamic exception types. So type(e) would
-        # be "botocore.errorfactory.NoSuchEntityException", but NoSuchEntityException
-        # can't be imported from botocore.errorfactory.
-        if type(e).__name__ == "NoSuchEntityException":
-            return False
-
-        raise
+    except iam_client.exceptions.NoSuchEntityException:
+        # boto3 creates its exception types dynamically, so NoSuchEntityException can't
+        # be imported from botocore.errorfactory, but it is available on the client
+        return False
 
 
 def _ensure_meadowgrid_coordinator_iam_role(region_name: str) -> None:
@@ -145,7 +290,7 @@ def _ensure_meadowgrid_coordinator_iam_role(region_name: str) -> None:
     TODO does not try to update the role if/when we change the policies below
     """
 
-    iam = boto3.client("iam", region_name=region_name)
+    iam = _get_boto3_client("iam", region_name)
     if not _iam_role_exists(iam, _MEADOWGRID_COORDINATOR_ROLE):
         # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/iam.html#IAM.ServiceResource.create_role
         # TODO look into MaxSessionDuration parameter, roles potentially expiring?
@@ -196,19 +341,37 @@ def _get_ec2_security_group(ec2_resource: Any, name: str) -> Any:
         return groups[0]
 
 
+# (time.monotonic() when we got the ip address, ip address), see _get_current_ip_for_ssh
+_current_ip_for_ssh: Optional[Tuple[float, str]] = None
+# Our public ip address can change, so we only reuse the last result for this long
+_CURRENT_IP_FOR_SSH_CACHE_SECS = 5 * 60
+
+
 async def _get_current_ip_for_ssh() -> str:
     """
     Gets an ip address for the current machine that is likely to work for allowing SSH
     into an EC2 instance.
     """
-    # if we're already in an EC2 instance, use the EC2 metadata to get our private IP
-    private_ip = await _get_ec2_metadata("local-ipv4")
-    if private_ip:
-        return private_ip
+    global _current_ip_for_ssh
+
+    if (
+        _current_ip_for_ssh is not None
+        and time.monotonic() - _current_ip_for_ssh[0] < _CURRENT_IP_FOR_SSH_CACHE_SECS
+    ):
+        return _current_ip_for_ssh[1]
+
+    async with aiohttp.ClientSession() as http_session:
+        # if we're already in an EC2 instance, use the EC2 metadata to get our private
+        # IP
+        ip = await _get_ec2_metadata("local-ipv4", http_session)
+        if not ip:
+            # otherwise, we'll use checkip.amazonaws.com to figure out how AWS sees our
+            # IP
+            async with http_session.get("https://checkip.amazonaws.com/") as response:
+                ip = (await response.text()).strip()
 
-    # otherwise, we'll use checkip.amazonaws.com to figure out how AWS sees our IP
-    async with aiohttp.request("GET", "https://checkip.amazonaws.com/") as response:
-        return (await response.text()).strip()
+    _current_ip_for_ssh = time.monotonic(), ip
+    return ip
 
 
 async def ensure_meadowgrid_ssh_security_group() -> str:
@@ -225,6 +388,26 @@ async def ensure_meadowgrid_ssh_security_group() -> str:
     )
 
 
+def _get_tcp_ingress_rules(
+    ip_permissions: Iterable[Any],
+) -> Tuple[Set[Tuple[int, int, str]], Set[Tuple[int, int, str]]]:
+    """
+    Converts a security group's IpPermissions into the (from_port, to_port, cidr_ip)
+    and (from_port, to_port, group_id) rules that ensure_security_group takes
+    """
+    cidr_block_rules = set()
+    group_rules = set()
+    for permission in ip_permissions:
+        if permission.get("IpProtocol") != "tcp":
+            continue
+        ports = permission["FromPort"], permission["ToPort"]
+        for ip_range in permission.get("IpRanges", ()):
+            cidr_block_rules.add((*ports, ip_range["CidrIp"]))
+        for group_pair in permission.get("UserIdGroupPairs", ()):
+            group_rules.add((*ports, group_pair["GroupId"]))
+    return cidr_block_rules, group_rules
+
+
 def ensure_security_group(
     group_name: str,
     open_port_cidr_block: Sequence[Tuple[int, int, str]],
@@ -239,38 +422,57 @@ def ensure_security_group(
 
     Returns the id of the security group.
     """
-    ec2_resource = boto3.resource("ec2")
+    ec2_resource = _get_boto3_resource("ec2")
     security_group = _get_ec2_security_group(ec2_resource, group_name)
     if security_group is None:
         security_group = ec2_resource.create_security_group(
             Description=group_name, GroupName=group_name
         )
-
-    for from_port, to_port, cidr_ip in open_port_cidr_block:
-        ignore_boto3_error_code(
-            lambda: security_group.authorize_ingress(
-                IpProtocol="tcp",
-                CidrIp=cidr_ip,
-                FromPort=from_port,
-                ToPort=to_port,
-            ),
-            "InvalidPermission.Duplicate",
+    else:
+        # Usually the rules we want already exist, so we only add the missing ones
+        # rather than making an authorize_ingress call per rule just to get an
+        # InvalidPermission.Duplicate error back. ip_permissions was already loaded by
+        # _get_ec2_security_group, so this doesn't make an API call.
+        existing_cidr_block, existing_group = _get_tcp_ingress_rules(
+            security_group.ip_permissions
         )
+        open_port_cidr_block = [
+            rule for rule in open_port_cidr_block if rule not in existing_cidr_block
+        ]
+        open_port_group = [
+            rule for rule in open_port_group if rule not in existing_group
+        ]
 
-    for from_port, to_port, group_id in open_port_group:
-        ignore_boto3_error_code(
-            lambda: security_group.authorize_ingress(
-                IpPermissions=[
-                    {
-                        "FromPort": from_port,
-                        "ToPort": to_port,
-                        "IpProtocol": "tcp",
-                        "UserIdGroupPairs": [{"GroupId": group_id}],
-                    }
-                ]
-            ),
+    ip_permissions = [
+        {
+            "FromPort": from_port,
+            "ToPort": to_port,
+            "IpProtocol": "tcp",
+            "IpRanges": [{"CidrIp": cidr_ip}],
+        }
+        for from_port, to_port, cidr_ip in open_port_cidr_block
+    ] + [
+        {
+            "FromPort": from_port,
+            "ToPort": to_port,
+            "IpProtocol": "tcp",
+            "UserIdGroupPairs": [{"GroupId": group_id}],
+        }
+        for from_port, to_port, group_id in open_port_group
+    ]
+
+    if ip_permissions:
+        # add all of the rules with a single call
+        success, _ = ignore_boto3_error_code(
+            lambda: security_group.authorize_ingress(IpPermissions=ip_permissions),
             "InvalidPermission.Duplicate",
         )
+        if not success:
+            # Another process added some of the same rules in the meantime. If any rule
+            # is a duplicate, the whole call fails, so we add the rules one at a time
+            for ip_permission in ip_permissions:
+                with suppress_boto3_error_code("InvalidPermission.Duplicate"):
+                    security_group.authorize_ingress(IpPermissions=[ip_permission])
 
     return security_group.id
 
@@ -295,6 +497,46 @@ async def launch_ec2_instance(
     One wrinkle is that if you specify tags for a spot instance, we have to wait for it
     to launch, as there's no way to tag a spot instance before it's running.
     """
+    public_dns_names = await _launch_ec2_instances_of_type(
+        region_name,
+        instance_type,
+        on_demand_or_spot,
+        1,
+        ami_id,
+        security_group_ids,
+        iam_role_name,
+        user_data,
+        key_name,
+        tags,
+        wait_for_dns_name,
+    )
+    if public_dns_names is None:
+        return None
+    else:
+        return public_dns_names[0]
+
+
+async def _launch_ec2_instances_of_type(
+    region_name: str,
+    instance_type: str,
+    on_demand_or_spot: OnDemandOrSpotType,
+    num_instances: int,
+    ami_id: str,
+    security_group_ids: Optional[Sequence[str]] = None,
+    iam_role_name: Optional[str] = None,
+    user_data: Optional[str] = None,
+    key_name: Optional[str] = None,
+    tags: Optional[Dict[str, str]] = None,
+    wait_for_dns_name: bool = True,
+) -> Optional[List[str]]:
+    """
+    Like launch_ec2_instance, but launches num_instances instances of the same type with
+    a single API call. If wait_for_dns_name is True, returns the public dns names of all
+    of the instances.
+    """
+
+    if on_demand_or_spot not in ("on_demand", "spot"):
+        raise ValueError(f"Unexpected value for on_demand_or_spot {on_demand_or_spot}")
 
     optional_args: Dict[str, Any] = {}
     if security_group_ids:
@@ -303,110 +545,184 @@ async def launch_ec2_instance(
         optional_args["IamInstanceProfile"] = {"Name": iam_role_name}
     if key_name:
         optional_args["KeyName"] = key_name
+    # tags in the format the EC2 API expects
+    ec2_tags: List[TagTypeDef] = [
+        {"Key": key, "Value": value} for key, value in (tags or {}).items()
+    ]
 
-    if on_demand_or_spot == "on_demand":
-        if user_data:
-            optional_args["UserData"] = user_data
-        if tags:
-            optional_args["TagSpecifications"] = [
-                {
-                    "ResourceType": "instance",
-                    "Tags": [
-                        {"Key": key, "Value": value} for key, value in tags.items()
-                    ],
-                }
-            ]
+    # We use aiobotocore rather than boto3 so that we can launch many instances at the
+    # same time (and wait for them to start running) without needing a thread per
+    # instance
+    async with aiobotocore.session.get_session().create_client(
+        "ec2", region_name=region_name, config=_EC2_LAUNCH_CLIENT_CONFIG
+    ) as client:
+        if on_demand_or_spot == "on_demand":
+            if user_data:
+                # run_instances base64-encodes UserData for us
+                optional_args["UserData"] = user_data
+            if tags:
+                optional_args["TagSpecifications"] = [
+                    {
+                        "ResourceType": "instance",
+                        "Tags": ec2_tags,
+                    }
+                ]
 
-        ec2_resource = boto3.resource("ec2", region_name=region_name)
-        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ec2.html#EC2.Client.run_instances
-        instance = ec2_resource.create_instances(
-            ImageId=ami_id,
-            MinCount=1,
-            MaxCount=1,
-            InstanceType=instance_type,
-            **optional_args,
-        )[0]
-
-        if wait_for_dns_name:
-            # boto3 doesn't have any async APIs, which means that in order to run more
-            # than one launch_ec2_instance at the same time, we need to have a thread
-            # that waits. We use an asyncio.Future here to make the API async, so from
-            # the user perspective, it feels like this function is async
-
-            # boto3 should be threadsafe:
-            # https://boto3.amazonaws.com/v1/documentation/api/latest/guide/clients.html#multithreading-or-multiprocessing-with-clients
-            instance_running_future: asyncio.Future = asyncio.Future()
-            event_loop = asyncio.get_running_loop()
-
-            def wait_until_running() -> None:
-                instance.wait_until_running()
-                event_loop.call_soon_threadsafe(
-                    lambda: instance_running_future.set_result(None)
+            # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ec2.html#EC2.Client.run_instances
+            # With MinCount=1, EC2 launches as many of the instances as it has capacity
+            # for rather than failing the whole request. If we get fewer than we asked
+            # for, we ask for the rest again, which either launches at least one more
+            # instance or raises (e.g. InsufficientInstanceCapacity).
+            instance_ids: List[str] = []
+            while len(instance_ids) < num_instances:
+                instance_ids.extend(
+                    instance["InstanceId"]
+                    for instance in (
+                        await client.run_instances(
+                            ImageId=ami_id,
+                            MinCount=1,
+                            MaxCount=num_instances - len(instance_ids),
+                            InstanceType=instance_type,  # type: ignore[arg-type]
+                            **optional_args,
+                        )
+                    )["Instances"]
                 )
 
-            threading.Thread(target=wait_until_running).start()
-            await instance_running_future
+            if wait_for_dns_name:
+                await client.get_waiter("instance_running").wait(
+                    InstanceIds=instance_ids
+                )
+                public_dns_names = await _get_public_dns_names(client, instance_ids)
+                if not all(public_dns_names):
+                    raise ValueError("Waited until running, but still no IP address!")
+                return public_dns_names
+            else:
+                return None
+        else:  # spot
+            if user_data:
+                # base64 output is always ASCII
+                optional_args["UserData"] = base64.b64encode(
+                    user_data.encode("utf-8")
+                ).decode("ascii")
+
+            # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ec2.html#EC2.Client.request_spot_instances
+            spot_instance_request = await client.request_spot_instances(
+                InstanceCount=num_instances,
+                LaunchSpecification={
+                    "ImageId": ami_id,
+                    "InstanceType": instance_type,
+                    **optional_args,  # type: ignore[misc]
+                },
+            )
 
-            instance.load()
-            if not instance.public_dns_name:
-                raise ValueError("Waited until running, but still no IP address!")
-            return instance.public_dns_name
-        else:
-            return None
-    elif on_demand_or_spot == "spot":
-        if user_data:
-            optional_args["UserData"] = base64.b64encode(
-                user_data.encode("utf-8")
-            ).decode("utf-8")
-
-        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ec2.html#EC2.Client.request_spot_instances
-        client = boto3.client("ec2", region_name=region_name)
-        spot_instance_request = client.request_spot_instances(
-            InstanceCount=1,
-            LaunchSpecification={
-                "ImageId": ami_id,
-                "InstanceType": instance_type,
-                **optional_args,
-            },
-        )
+            if wait_for_dns_name or tags:
+                spot_instance_request_ids = [
+                    request["SpotInstanceRequestId"]
+                    for request in spot_instance_request["SpotInstanceRequests"]
+                ]
 
-        if wait_for_dns_name or tags:
-            # see above for comment about boto3 async/threads
-            spot_instance_request_id = spot_instance_request["SpotInstanceRequests"][0][
-                "SpotInstanceRequestId"
-            ]
+                instance_ids = await _wait_for_spot_instance_requests(
+                    client, spot_instance_request_ids
+                )
 
-            instance_running_future = asyncio.Future()
-            event_loop = asyncio.get_running_loop()
-            waiter = client.get_waiter("spot_instance_request_fulfilled")
+                # now that we have instance ids, we can add our tags
+                if tags:
+                    await client.create_tags(
+                        Resources=instance_ids,
+                        Tags=ec2_tags,
+                    )
 
-            def wait_until_running() -> None:
-                waiter.wait(SpotInstanceRequestIds=[spot_instance_request_id])
-                event_loop.call_soon_threadsafe(
-                    lambda: instance_running_future.set_result(None)
-                )
+                return await _get_public_dns_names(client, instance_ids)
+            else:
+                return None
 
-            threading.Thread(target=wait_until_running).start()
-            await instance_running_future
 
-            instance_id = client.describe_spot_instance_requests(
-                SpotInstanceRequestIds=[spot_instance_request_id]
-            )["SpotInstanceRequests"][0]["InstanceId"]
+async def _wait_for_spot_instance_requests(
+    client: Any, spot_instance_request_ids: List[str]
+) -> List[str]:
+    """
+    Waits for the specified spot instance requests to be fulfilled, and returns their
+    instance ids in the same order. client should be an aiobotocore EC2 client.
 
-            # now that we have an instance id, we can add our tags
-            if tags:
-                client.create_tags(
-                    Resources=[instance_id],
-                    Tags=[{"Key": key, "Value": value} for key, value in tags.items()],
+    This is similar to the spot_instance_request_fulfilled waiter, but the waiter polls
+    every 15 seconds, and most spot requests are fulfilled within a few seconds. We also
+    get the instance ids from the same describe_spot_instance_requests call that tells
+    us the requests are fulfilled.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + _SPOT_REQUEST_WAIT_TIMEOUT_SECS
+    delay = _SPOT_REQUEST_CHECK_INITIAL_DELAY_SECS
+    while True:
+        await asyncio.sleep(delay)
+        try:
+            requests = (
+                await client.describe_spot_instance_requests(
+                    SpotInstanceRequestIds=spot_instance_request_ids
                 )
-
-            return client.describe_instances(InstanceIds=[instance_id])["Reservations"][
-                0
-            ]["Instances"][0]["PublicDnsName"]
+            )["SpotInstanceRequests"]
+        except botocore.exceptions.ClientError as e:
+            # spot requests are eventually consistent, so they might not be visible
+            # right after we create them
+            if (
+                e.response.get("Error", {}).get("Code")
+                != "InvalidSpotInstanceRequestID.NotFound"
+            ):
+                raise
         else:
-            return None
-    else:
-        raise ValueError(f"Unexpected value for on_demand_or_spot {on_demand_or_spot}")
+            failed_requests = [
+                request
+                for request in requests
+                if request["State"] in ("closed", "cancelled", "failed")
+            ]
+            if failed_requests:
+                raise ValueError(
+                    "Spot instance requests were not fulfilled: "
+                    + ", ".join(
+                        f"{request['SpotInstanceRequestId']} "
+                        f"({request.get('Status', {}).get('Code')})"
+                        for request in failed_requests
+                    )
+                )
+            if all("InstanceId" in request for request in requests):
+                instance_ids = {
+                    request["SpotInstanceRequestId"]: request["InstanceId"]
+                    for request in requests
+                }
+                return [
+                    instance_ids[request_id] for request_id in spot_instance_request_ids
+                ]
+
+        if loop.time() >= deadline:
+            raise TimeoutError(
+                "Spot instance requests were not fulfilled within "
+                f"{_SPOT_REQUEST_WAIT_TIMEOUT_SECS} seconds: "
+                + ", ".join(spot_instance_request_ids)
+            )
+        delay = min(
+            delay * _SPOT_REQUEST_CHECK_BACKOFF, _SPOT_REQUEST_CHECK_MAX_DELAY_SECS
+        )
+
+
+async def _get_public_dns_names(client: Any, instance_ids: List[str]) -> List[str]:
+    """
+    Returns the public dns names of instance_ids in the same order. client should be an
+    aiobotocore EC2 client
+    """
+    public_dns_names = {
+        instance["InstanceId"]: instance["PublicDnsName"]
+        for reservation in (await client.describe_instances(InstanceIds=instance_ids))[
+            "Reservations"
+        ]
+        for instance in reservation["Instances"]
+    }
+    return [public_dns_names[instance_id] for instance_id in instance_ids]
+
+
+async def _run_with_semaphore(
+    semaphore: asyncio.Semaphore, coroutine: Awaitable[_T]
+) -> _T:
+    async with semaphore:
+        return await coroutine
 
 
 @dataclasses.dataclass(frozen=True)
@@ -463,18 +779,9 @@ async def launch_ec2_instances(
             f"memory={memory_gb_required_per_job}, cpu={logical_cpu_required_per_job}"
         )
 
-    public_dns_name_tasks = []
-    host_metadatas = []
-
-    for (
-        instance_type,
-        on_demand_or_spot,
-        num_instances,
-        memory_gb,
-        logical_cpu,
-        interruption_probability,
-        max_jobs,
-    ) in chosen_instance_types[
+    # to_dict converts each row to native Python types once, rather than unpacking
+    # numpy scalars row by row
+    chosen_rows = chosen_instance_types[
         [
             "instance_type",
             "on_demand_or_spot",
@@ -484,16 +791,18 @@ async def launch_ec2_instances(
             "interruption_probability",
             "workers_per_instance",
         ]
-    ].itertuples(
-        index=False
-    ):
-        for _ in range(num_instances):
-            # should really launch these with a single API call
-            public_dns_name_tasks.append(
-                launch_ec2_instance(
+    ].to_dict("records")
+
+    launch_semaphore = asyncio.Semaphore(_MAX_CONCURRENT_LAUNCHES)
+    public_dns_names = await asyncio.gather(
+        *(
+            _run_with_semaphore(
+                launch_semaphore,
+                _launch_ec2_instances_of_type(
                     region_name,
-                    instance_type,
-                    on_demand_or_spot,
+                    row["instance_type"],
+                    row["on_demand_or_spot"],
+                    row["num_instances"],
                     ami_id=ami_id,
                     security_group_ids=security_group_ids,
                     iam_role_name=iam_role_name,
@@ -501,24 +810,25 @@ async def launch_ec2_instances(
                     key_name=key_name,
                     tags=tags,
                     wait_for_dns_name=True,
-                )
-            )
-            host_metadatas.append(
-                (
-                    instance_type,
-                    on_demand_or_spot,
-                    memory_gb,
-                    logical_cpu,
-                    interruption_probability,
-                    max_jobs,
-                )
+                ),
             )
-
-    public_dns_names = await asyncio.gather(*public_dns_name_tasks)
+            for row in chosen_rows
+        )
+    )
 
     return [
-        EC2Instance(public_dns_name, *host_metadata)
-        for public_dns_name, host_metadata in zip(public_dns_names, host_metadatas)
+        EC2Instance(
+            public_dns_name,
+            row["instance_type"],
+            row["on_demand_or_spot"],
+            row["memory_gb"],
+            row["logical_cpu"],
+            row["interruption_probability"],
+            row["workers_per_instance"],
+        )
+        for public_dns_names_of_type, row in zip(public_dns_names, chosen_rows)
+        # public_dns_names_of_type is only None if wait_for_dns_name is False
+        for public_dns_name in cast(List[str], public_dns_names_of_type)
     ]
 
 
@@ -551,10 +861,13 @@ async def _ensure_meadowgrid_security_groups() -> str:
     )
 
 
-async def launch_meadowgrid_coordinator(region_name: Optional[str] = None) -> str:
+async def launch_meadowgrid_coordinator(
+    region_name: Optional[str] = None, timeout_secs: float = 300
+) -> str:
     """
     Launches a meadowgrid coordinator in AWS. Returns the address of the coordinator,
-    e.g. 1.1.1.1:15319
+    e.g. 1.1.1.1:15319. Raises TimeoutError if the coordinator doesn't respond within
+    timeout_secs of the instance starting.
 
     TODO the coordinator will never get shutdown automatically. Also, there should be a
     way to share coordinators.
@@ -562,8 +875,12 @@ async def launch_meadowgrid_coordinator(region_name: Optional[str] = None) -> st
     if region_name is None:
         region_name = await _get_default_region_name()
 
-    _ensure_meadowgrid_coordinator_iam_role(region_name)
-    security_group_id = await _ensure_meadowgrid_security_groups()
+    # The IAM role and the security groups don't depend on each other, so set up the
+    # IAM role on a separate thread while we work on the security groups
+    _, security_group_id = await asyncio.gather(
+        asyncio.to_thread(_ensure_meadowgrid_coordinator_iam_role, region_name),
+        _ensure_meadowgrid_security_groups(),
+    )
 
     # Create the coordinator instance
     # TODO we've just hardcoded the instance type for the coordinator for now
@@ -580,10 +897,13 @@ async def launch_meadowgrid_coordinator(region_name: Optional[str] = None) -> st
     # now wait until check() returns True
     coordinator_address = f"{coordinator_ip}:{DEFAULT_COORDINATOR_PORT}"
 
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout_secs
+    # back off exponentially, as the coordinator usually takes tens of seconds to boot
+    delay = _COORDINATOR_CHECK_INITIAL_DELAY_SECS
     async with MeadowGridCoordinatorClientAsync(coordinator_address) as client:
-        # TODO add a (configurable) timeout
         while True:
-            await asyncio.sleep(0.2)
+            await asyncio.sleep(delay)
             try:
                 if await client.check():
                     break
@@ -591,6 +911,15 @@ async def launch_meadowgrid_coordinator(region_name: Optional[str] = None) -> st
                 # TODO there are probably some exceptions we shouldn't ignore
                 pass
 
+            if loop.time() >= deadline:
+                raise TimeoutError(
+                    f"Coordinator at {coordinator_address} did not respond within "
+                    f"{timeout_secs} seconds"
+                )
+            delay = min(
+                delay * _COORDINATOR_CHECK_BACKOFF, _COORDINATOR_CHECK_MAX_DELAY_SECS
+            )
+
     return coordinator_ip
 
 
@@ -616,21 +945,36 @@ class AwsAgentCreator(AgentCreator):
         if self._region_name is None:
             self._region_name = await _get_default_region_name()
 
+        # used for all of our HTTP requests (i.e. ones that don't go through boto3), so
+        # that we can reuse connections across the periodic instance type updates
+        self._http_session = aiohttp.ClientSession()
+
         # describes the available instance types in EC2 including their costs. See
-        # agent_creator:choose_instance_types_for_job for the columns this dataframe has
-        self._ec2_instance_types: Optional[pd.DataFrame] = None
+        # agent_creator:choose_instance_types_for_job for the columns this dataframe
+        # has. We start with the data we cached on disk the last time we ran (if it's
+        # recent enough) so that we don't need to wait for the first download to finish
+        # before we can create agents.
+        self._ec2_instance_types_cache_path = os.path.join(
+            _EC2_PRICES_CACHE_DIR, f"ec2_instance_types_{self._region_name}.parquet"
+        )
+        self._ec2_instance_types: Optional[pd.DataFrame] = await asyncio.to_thread(
+            _read_cached_dataframe,
+            self._ec2_instance_types_cache_path,
+            EC2_INSTANCE_TYPES_CACHE_SECS,
+        )
         # a permanently running task that periodically gets EC2 instance type data. The
         # things that will change are the prices and interruption probabilities.
         self._update_ec2_instance_types_task = asyncio.create_task(
             self._update_ec2_instance_types()
         )
         # An event that tells us when we've gotten at least one download of the EC2
-        # instance types. Warning, if there's an issue getting the instance types data,
-        # this event will just never trigger.
+        # instance types (or we loaded them from the cache).
         self._first_update_of_ec2_instance_types = asyncio.Event()
+        if self._ec2_instance_types is not None:
+            self._first_update_of_ec2_instance_types.set()
 
         # get an address that agents we create can use to talk to us (the coordinator)
-        private_ip = await _get_ec2_metadata("local-ipv4")
+        private_ip = await _get_ec2_metadata("local-ipv4", self._http_session)
         if private_ip is None:
             raise ValueError(
                 "The AwsAgentCreator can only be used from an EC2 instance."
@@ -650,7 +994,12 @@ class AwsAgentCreator(AgentCreator):
         while True:
             try:
                 self._ec2_instance_types = await _get_ec2_instance_types(
-                    self._region_name
+                    self._region_name, self._http_session
+                )
+                await asyncio.to_thread(
+                    _write_cached_dataframe,
+                    self._ec2_instance_types_cache_path,
+                    self._ec2_instance_types,
                 )
             except Exception:
                 # TODO this should probably be more prominent somehow
@@ -669,6 +1018,9 @@ class AwsAgentCreator(AgentCreator):
         await asyncio.wait_for(self._first_update_of_ec2_instance_types.wait(), 60 * 5)
         return self._ec2_instance_types
 
+    def get_instance_types_cached(self) -> Optional[pd.DataFrame]:
+        return self._ec2_instance_types
+
     async def launch_job_specific_agent(
         self,
         agent_id: str,
@@ -707,6 +1059,8 @@ class AwsAgentCreator(AgentCreator):
         except asyncio.exceptions.CancelledError:
             pass
 
+        await self._http_session.close()
+
 
 async def _launch_job_specific_agent(
     agent_id: str,
@@ -716,7 +1070,7 @@ async def _launch_job_specific_agent(
     on_demand_or_spot: OnDemandOrSpotType,
     region_name: str,
 ) -> None:
-    ec2_resource = boto3.resource("ec2", region_name=region_name)
+    ec2_resource = _get_boto3_resource("ec2", region_name)
 
     security_group = _get_ec2_security_group(
         ec2_resource, _MEADOWGRID_AGENT_SECURITY_GROUP
@@ -747,18 +1101,38 @@ echo JOB_ID={job_id} >> /meadowgrid/agent.conf
     )
 
 
-async def _get_ec2_instance_types(region_name: str) -> pd.DataFrame:
+async def _get_ec2_instance_types(
+    region_name: str, http_session: Optional[aiohttp.ClientSession] = None
+) -> pd.DataFrame:
     """
     Gets a dataframe describing EC2 instance types and their prices in the format
-    expected by agent_creator:choose_instance_types_for_job
+    expected by agent_creator:choose_instance_types_for_job. If http_session is
+    provided, it will be used for any HTTP requests (see _http_get).
     """
 
     # TODO at some point add cross-region optimization
 
-    # the on_demand_prices dataframe also contains e.g. CPU/memory information
-    on_demand_prices = _get_ec2_on_demand_prices(region_name)
-    spot_prices = _get_ec2_spot_prices(region_name)
-    interruption_probabilities = await _get_ec2_interruption_probability(region_name)
+    # the on_demand_prices dataframe also contains e.g. CPU/memory information. The
+    # prices and the interruption probabilities are independent, so we fetch them
+    # concurrently. The prices use boto3, which blocks, so they run on a separate thread
+    (on_demand_prices, spot_prices), interruption_probabilities = await asyncio.gather(
+        asyncio.to_thread(_get_ec2_prices, region_name),
+        _get_ec2_interruption_probability(region_name, http_session),
+    )
+
+    # We make instance_type a categorical with the same categories in all of our
+    # dataframes so that the joins below are on integer codes rather than on strings.
+    # We can only use instance types that we have on-demand data for, so those are our
+    # categories, and any other instance types in spot_prices/interruption_probabilities
+    # just become NaN
+    instance_type_dtype = pd.CategoricalDtype(
+        on_demand_prices["instance_type"].unique()
+    )
+    on_demand_prices = on_demand_prices.astype({"instance_type": instance_type_dtype})
+    spot_prices = spot_prices.astype({"instance_type": instance_type_dtype})
+    interruption_probabilities = interruption_probabilities.astype(
+        {"instance_type": instance_type_dtype}
+    )
 
     # Enrich the spot_prices data with CPU/memory information from on_demand_prices
     # and interruption_probabilities
@@ -766,25 +1140,37 @@ async def _get_ec2_instance_types(region_name: str) -> pd.DataFrame:
     # probabilities where we don't have on_demand_prices or spot_prices respectively,
     # right now we just drop that data
     spot_prices = (
-        on_demand_prices.drop(["price"], axis=1)
-        .merge(spot_prices, on="instance_type", how="inner")
-        .merge(interruption_probabilities, on="instance_type", how="left")
+        on_demand_prices.rename(columns={"price": "on_demand_price"})
+        .set_index("instance_type")
+        .join(spot_prices.set_index("instance_type"), how="inner")
+        .join(interruption_probabilities.set_index("instance_type"), how="left")
+        .reset_index()
     )
 
+    # A spot instance that costs at least as much as the on-demand instance of the same
+    # type will never get chosen by choose_instance_types_for_job, as the on-demand
+    # instance is just as cheap and has no chance of interruption. Dropping these here
+    # means we don't have to consider them every time we choose instance types
+    spot_prices = spot_prices[
+        spot_prices["price"] < spot_prices["on_demand_price"]
+    ].drop(["on_demand_price"], axis=1)
+
     # If we have spot instances that don't have interruption probabilities, just assume
     # a relatively high interruption_probability.
     spot_prices["interruption_probability"] = spot_prices[
         "interruption_probability"
-    ].fillna(80)
+    ].fillna(np.float32(80))
 
     # combine on_demand and spot data and return
     prices = pd.concat(
         [
             spot_prices.assign(on_demand_or_spot="spot"),
             on_demand_prices.assign(
-                on_demand_or_spot="on_demand", interruption_probability=0
+                on_demand_or_spot="on_demand", interruption_probability=np.float32(0)
             ),
-        ]
+        ],
+        ignore_index=True,
+        copy=False,
     )
     return prices
 
@@ -792,15 +1178,34 @@ async def _get_ec2_instance_types(region_name: str) -> pd.DataFrame:
 def _get_ec2_on_demand_prices(region_name: str) -> pd.DataFrame:
     """
     Returns a dataframe with columns instance_type, memory_gb, logical_cpu, and price
-    where price is the on-demand price
+    where price is the on-demand price.
+
+    Downloading these prices is slow and they rarely change, so the result is cached on
+    disk for EC2_ON_DEMAND_PRICES_CACHE_SECS.
     """
+    cache_path = os.path.join(
+        _EC2_PRICES_CACHE_DIR, f"ec2_on_demand_prices_{region_name}.parquet"
+    )
+
+    if MEADOWGRID_REFRESH_EC2_ON_DEMAND_PRICES not in os.environ:
+        result = _read_cached_dataframe(cache_path, EC2_ON_DEMAND_PRICES_CACHE_SECS)
+        if result is not None:
+            return result
+
+    result = _download_ec2_on_demand_prices(region_name)
+    _write_cached_dataframe(cache_path, result)
+    return result
+
+
+def _download_ec2_on_demand_prices(region_name: str) -> pd.DataFrame:
+    """See _get_ec2_on_demand_prices"""
 
     # All comments about the pricing API are based on
     # https://www.sentiatechblog.com/using-the-ec2-price-list-api
 
     # us-east-1 is the only region this pricing API is available and the pricing
     # endpoint in us-east-1 has pricing data for all regions.
-    pricing_client = boto3.client("pricing", region_name="us-east-1")
+    pricing_client = _get_boto3_client("pricing", "us-east-1")
 
     filters = [
         # only get prices for the specified region
@@ -829,21 +1234,80 @@ def _get_ec2_on_demand_prices(region_name: str) -> pd.DataFrame:
         {"Type": "TERM_MATCH", "Field": "capacitystatus", "Value": "Used"},
     ]
 
-    records = []
-    for product_json in _boto3_paginate(
-        pricing_client.get_products,
-        Filters=filters,
-        ServiceCode="AmazonEC2",
-        FormatVersion="aws_v1",
-    ):
-        product = json.loads(product_json)
+    # Paging through get_products is bound by the latency of each request, and we can't
+    # request the pages of a single query in parallel. Instead, we split the query into
+    # one query per instance family (e.g. "General purpose", "Compute optimized") and
+    # run those in parallel (boto3 clients are thread-safe).
+    instance_families = [
+        attribute_value["Value"]
+        for attribute_value in _boto3_paginate(
+            pricing_client.get_attribute_values,
+            ServiceCode="AmazonEC2",
+            AttributeName="instanceFamily",
+        )
+    ]
+    shard_filters = [
+        [{"Type": "TERM_MATCH", "Field": "instanceFamily", "Value": instance_family}]
+        for instance_family in instance_families
+    ]
+    # Not every product necessarily has an instanceFamily, and a new family could show
+    # up after we list them, so one more query picks up every product whose
+    # instanceFamily isn't one of the families above. Together, the queries return
+    # exactly the products that a single unsharded query would.
+    if instance_families:
+        shard_filters.append(
+            [
+                {
+                    "Type": "NONE_OF",
+                    "Field": "instanceFamily",
+                    "Value": ",".join(instance_families),
+                }
+            ]
+        )
+    else:
+        shard_filters.append([])
+
+    def get_products_for_shard(shard_filter: List[Dict[str, str]]) -> List[str]:
+        return list(
+            _boto3_paginate(
+                pricing_client.get_products,
+                Filters=filters + shard_filter,
+                ServiceCode="AmazonEC2",
+                FormatVersion="aws_v1",
+            )
+        )
+
+    with concurrent.futures.ThreadPoolExecutor(
+        _MAX_CONCURRENT_PRICING_REQUESTS
+    ) as executor:
+        product_jsons = list(
+            itertools.chain.from_iterable(
+                executor.map(get_products_for_shard, shard_filters)
+            )
+        )
+
+    # we collect the numeric fields as strings and parse them after the loop
+    instance_types = []
+    memory_amounts = []
+    vcpus = []
+    usd_prices = []
+    for product_json in product_jsons:
+        # The pricing API can't filter by processor, so a lot of the products we get
+        # back are Graviton instances, which we would skip below anyway. Checking the
+        # raw JSON for the physicalProcessor value (e.g. "AWS Graviton2 Processor")
+        # first means we don't spend time parsing them.
+        if '"AWS Graviton' in product_json:
+            continue
+
+        product = _json_loads(product_json)
         attributes = product["product"]["attributes"]
         instance_type = attributes["instanceType"]
 
         # We don't expect the "warnings" to get hit, we just don't want to get thrown
         # off if the data format changes unexpectedly or something like that.
 
-        if "physicalProcessor" not in attributes:
+        physical_processor = attributes.get("physicalProcessor")
+        if physical_processor is None:
             print(
                 f"Warning, skipping {instance_type} because physicalProcessor is not "
                 "specified"
@@ -852,39 +1316,42 @@ def _get_ec2_on_demand_prices(region_name: str) -> pd.DataFrame:
 
         # effectively, this skips Graviton (ARM-based) processors
         # TODO eventually support Graviton processors.
+        physical_processor_lower = physical_processor.lower()
         if (
-            "intel" not in attributes["physicalProcessor"].lower()
-            and "amd" not in attributes["physicalProcessor"].lower()
+            "intel" not in physical_processor_lower
+            and "amd" not in physical_processor_lower
         ):
             # only log if we see non-Graviton processors
-            if "AWS Graviton" not in attributes["physicalProcessor"]:
+            if "AWS Graviton" not in physical_processor:
                 print(
                     "Skipping non-Intel/AMD processor "
-                    f"{attributes['physicalProcessor']} in {instance_type}"
+                    f"{physical_processor} in {instance_type}"
                 )
             continue
 
-        if "OnDemand" not in product["terms"]:
+        # we unpack the values views directly rather than creating lists from them
+        on_demand_terms = product["terms"].get("OnDemand")
+        if not on_demand_terms:
             print(
                 f"Warning, skipping {instance_type} because there was no OnDemand terms"
             )
             continue
-        on_demand = list(product["terms"]["OnDemand"].values())
-        if len(on_demand) != 1:
+        if len(on_demand_terms) != 1:
             print(
                 f"Warning, skipping {instance_type} because there was more than one "
                 "OnDemand SKU"
             )
             continue
+        (on_demand,) = on_demand_terms.values()
 
-        price_dimensions = list(on_demand[0]["priceDimensions"].values())
+        price_dimensions = on_demand["priceDimensions"]
         if len(price_dimensions) != 1:
             print(
                 f"Warning, skipping {instance_type} because there was more than one "
                 "priceDimensions"
             )
             continue
-        pricing = price_dimensions[0]
+        (pricing,) = price_dimensions.values()
 
         if pricing["unit"] != "Hrs":
             print(
@@ -892,81 +1359,144 @@ def _get_ec2_on_demand_prices(region_name: str) -> pd.DataFrame:
                 f"Hrs: {pricing['unit']}"
             )
             continue
-        if "USD" not in pricing["pricePerUnit"]:
+        usd_price = pricing["pricePerUnit"].get("USD")
+        if usd_price is None:
             print(
                 f"Warning, skipping {instance_type} because the pricing is not in USD"
             )
             continue
-        usd_price = pricing["pricePerUnit"]["USD"]
-
-        try:
-            usd_price_float = float(usd_price)
-        except ValueError:
-            print(
-                f"Warning, skipping {instance_type} because the price is not a float: "
-                f"{usd_price}"
-            )
-            continue
 
         memory = attributes["memory"]
-        if not memory.endswith(" GiB"):
+        memory_amount, _, memory_unit = memory.rpartition(" ")
+        if memory_unit != "GiB":
             print(
                 f"Warning, skipping {instance_type} because memory doesn't end in GiB: "
                 f"{memory}"
             )
             continue
-        try:
-            memory_gb_float = float(memory[: -len(" GiB")])
-        except ValueError:
-            print(
-                f"Warning, skipping {instance_type} because memory isn't an float: "
-                f"{memory}"
-            )
-            continue
 
-        try:
-            vcpu_int = int(attributes["vcpu"])
-        except ValueError:
-            print(
-                f"Warning, skipping {instance_type} because vcpu isn't an int: "
-                f"{attributes['vcpu']}"
-            )
-            continue
+        instance_types.append(instance_type)
+        memory_amounts.append(memory_amount)
+        vcpus.append(attributes["vcpu"])
+        usd_prices.append(usd_price)
+
+    # Parse all of the numeric fields in one vectorized pass rather than calling
+    # float/int with a try/except for each product. Values that can't be parsed become
+    # NaN, and we skip those rows (and non-integer vcpus) below.
+    memory_gbs = pd.to_numeric(
+        pd.Series(memory_amounts, dtype=object), errors="coerce"
+    ).to_numpy(dtype=np.float64)
+    logical_cpus = pd.to_numeric(
+        pd.Series(vcpus, dtype=object), errors="coerce"
+    ).to_numpy(dtype=np.float64)
+    prices = pd.to_numeric(
+        pd.Series(usd_prices, dtype=object), errors="coerce"
+    ).to_numpy(dtype=np.float64)
+    invalid = (
+        np.isnan(memory_gbs)
+        | np.isnan(logical_cpus)
+        | (logical_cpus % 1 != 0)
+        | np.isnan(prices)
+    )
+    for i in np.flatnonzero(invalid):
+        print(
+            f"Warning, skipping {instance_types[i]} because memory, vcpu or price is "
+            f"not a number: {memory_amounts[i]} GiB, {vcpus[i]} vcpu, {usd_prices[i]}"
+        )
+    valid = ~invalid
+
+    # We construct each column with its final dtype so that pandas doesn't need to
+    # infer dtypes. logical_cpu doesn't need 64 bits. We keep memory_gb and price as
+    # float64 so that we don't lose any precision when comparing them against job
+    # requirements and prices in choose_instance_types_for_job
+    return pd.DataFrame(
+        {
+            "instance_type": np.array(instance_types, dtype=object)[valid],
+            "memory_gb": memory_gbs[valid],
+            "logical_cpu": logical_cpus[valid].astype(np.int16),
+            "price": prices[valid],
+        }
+    )
 
-        records.append((instance_type, memory_gb_float, vcpu_int, usd_price_float))
 
-    return pd.DataFrame.from_records(
-        records, columns=["instance_type", "memory_gb", "logical_cpu", "price"]
+def _get_ec2_prices(region_name: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Returns (_get_ec2_on_demand_prices, _get_ec2_spot_prices). We can only use instance
+    types that we have on-demand data for (that's where e.g. CPU/memory information
+    comes from), so we only get spot prices for those instance types.
+    """
+    on_demand_prices = _get_ec2_on_demand_prices(region_name)
+    return on_demand_prices, _get_ec2_spot_prices(
+        region_name, on_demand_prices["instance_type"].drop_duplicates().tolist()
     )
 
 
-def _get_ec2_spot_prices(region_name: str) -> pd.DataFrame:
+def _get_ec2_spot_prices(
+    region_name: str, instance_types: Optional[Sequence[str]] = None
+) -> pd.DataFrame:
     """
     Returns a dataframe with columns instance_type and price, where price is the latest
-    spot price
+    spot price. If instance_types is specified, only gets prices for those instance
+    types, which is much faster than getting prices for every instance type.
     """
-    ec2_client = boto3.client("ec2", region_name=region_name)
+    ec2_client = _get_boto3_client("ec2", region_name)
 
     # There doesn't appear to be an API for "give me the latest spot price for each
     # instance type". Instead, there's an API to get the spot price history. We query
     # for the last hour, assuming that all the instances we care about will have prices
     # within that last hour (no way to know whether that's actually true or not).
-    start_time = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
-    column_names = None
-    values = []
-    for price in _boto3_paginate(
-        ec2_client.describe_spot_price_history,
-        ProductDescriptions=["Linux/UNIX"],
-        StartTime=start_time,
-        MaxResults=10000,
-    ):
-        if column_names is None:
-            column_names = list(price.keys())
-        values.append(list(price.values()))
-    # The columns at this point are AvailabilityZone, InstanceType, ProductDescription,
-    # SpotPrice, Timestamp
-    spot_prices = pd.DataFrame(values, columns=column_names)
-    spot_prices["SpotPrice"] = spot_prices["SpotPrice"].astype(float)
+    # A timezone-aware start_time means botocore doesn't need to guess that a naive
+    # datetime is in UTC when it serializes it
+    start_time = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+        hours=1
+    )
+    optional_args: Dict[str, Any] = {}
+    if instance_types is not None:
+        optional_args["InstanceTypes"] = instance_types
+
+    # Similar to _get_ec2_on_demand_prices, paging through the spot price history is
+    # bound by the latency of each request, so we split the query into one query per
+    # availability zone and run those in parallel (boto3 clients are thread-safe).
+    availability_zones = [
+        availability_zone["ZoneName"]
+        for availability_zone in ec2_client.describe_availability_zones(
+            Filters=[{"Name": "zone-type", "Values": ["availability-zone"]}]
+        )["AvailabilityZones"]
+    ]
+
+    def get_spot_prices_for_availability_zone(availability_zone: str) -> List[Any]:
+        return list(
+            _boto3_paginate(
+                ec2_client.describe_spot_price_history,
+                ProductDescriptions=["Linux/UNIX"],
+                AvailabilityZone=availability_zone,
+                StartTime=start_time,
+                MaxResults=10000,
+                **optional_args,
+            )
+        )
+
+    # Each price also has AvailabilityZone and ProductDescription, but we only need
+    # these columns, so we build them up directly
+    price_instance_types = []
+    prices = []
+    timestamps = []
+    with concurrent.futures.ThreadPoolExecutor(
+        _MAX_CONCURRENT_PRICING_REQUESTS
+    ) as executor:
+        for price in itertools.chain.from_iterable(
+            executor.map(get_spot_prices_for_availability_zone, availability_zones)
+        ):
+            price_instance_types.append(price["InstanceType"])
+            prices.append(float(price["SpotPrice"]))
+            timestamps.append(price["Timestamp"])
+    spot_prices = pd.DataFrame(
+        {
+            "instance_type": np.array(price_instance_types, dtype=object),
+            "price": np.array(prices, dtype=np.float64),
+            "timestamp": pd.to_datetime(timestamps, utc=True),
+        }
+    )
 
     # We just want one spot price per instance type, so take the latest spot price for
     # each instance type, and if there are multiple spot prices for the same instance
@@ -974,27 +1504,25 @@ def _get_ec2_spot_prices(region_name: str) -> pd.DataFrame:
     # (e.g. the same instance type could have different prices in us-east-2b and
     # us-east-2c) because we assume the differences are small there.
     # TODO eventually account for AvailabilityZone?
-    return (
-        spot_prices.sort_values(["Timestamp", "SpotPrice"], ascending=False)
-        .drop_duplicates(["InstanceType"], keep="first")[["InstanceType", "SpotPrice"]]
-        .rename(columns={"InstanceType": "instance_type", "SpotPrice": "price"})
-    )
+    latest_spot_prices = spot_prices[
+        spot_prices["timestamp"]
+        == spot_prices.groupby("instance_type")["timestamp"].transform("max")
+    ]
+    return latest_spot_prices.groupby("instance_type", as_index=False, sort=False)[
+        "price"
+    ].max()
 
 
-async def _get_ec2_interruption_probability(region_name: str) -> pd.DataFrame:
-    """
-    Returns a dataframe with columns instance_type, interruption_probability.
-    interruption_probability is a percent, so values range from 0 to 100
-    """
+# (ETag, parsed JSON, average interruption probability by range) for the last spot
+# advisor data we downloaded, see _get_ec2_interruption_probability
+_spot_advisor_data: Optional[Tuple[str, Any, Dict[int, float]]] = None
 
-    # this is the data that drives https://aws.amazon.com/ec2/spot/instance-advisor/
-    # according to
-    # https://blog.doit-intl.com/spotinfo-a-new-cli-for-aws-spot-a9748bbe338f
-    async with aiohttp.request(
-        "GET", "https://spot-bid-advisor.s3.amazonaws.com/spot-advisor-data.json"
-    ) as response:
-        data = await response.json()
 
+def _get_average_interruption_probability_by_range(data: Any) -> Dict[int, float]:
+    """
+    Takes the spot advisor data and returns a dictionary from each range's index ("r")
+    to the average interruption probability for that range.
+    """
     # The data we get isn't documented, but appears straightforward and can be checked
     # against the Spot Instance Advisor webpage. Each instance type gets an "r" which
     # corresponds to a range of interruption probabilities. The ranges are defined in
@@ -1002,29 +1530,58 @@ async def _get_ec2_interruption_probability(region_name: str) -> pd.DataFrame:
     # like 22 (even though 20 != 22). We take an average interruption probability based
     # on the range implied by the maxes.
 
-    # Get the average interruption probability for each range
-    r_to_interruption_probability = (
-        pd.DataFrame.from_records(
-            [(r["index"], r["max"]) for r in data["ranges"]], columns=["index", "max"]
-        )
-        .sort_values("index")
-        .set_index("index")
-    )
-    r_to_interruption_probability["min"] = (
-        r_to_interruption_probability["max"].shift().fillna(0)
-    )
-    r_to_interruption_probability["average"] = (
-        r_to_interruption_probability["min"] + r_to_interruption_probability["max"]
-    ) / 2
+    # There are only a handful of ranges, so we just use plain Python. Each range's min
+    # is the previous range's max.
+    average_by_r = {}
+    range_min = 0
+    for r in sorted(data["ranges"], key=lambda r: r["index"]):
+        average_by_r[r["index"]] = (range_min + r["max"]) / 2
+        range_min = r["max"]
+    return average_by_r
+
+
+async def _get_ec2_interruption_probability(
+    region_name: str, http_session: Optional[aiohttp.ClientSession] = None
+) -> pd.DataFrame:
+    """
+    Returns a dataframe with columns instance_type, interruption_probability.
+    interruption_probability is a percent, so values range from 0 to 100
+    """
+
+    global _spot_advisor_data
+
+    # this is the data that drives https://aws.amazon.com/ec2/spot/instance-advisor/
+    # according to
+    # https://blog.doit-intl.com/spotinfo-a-new-cli-for-aws-spot-a9748bbe338f
+    # This file is large and only changes every so often, so if we've downloaded it
+    # before, we ask S3 to only send it again if it's changed. The data covers all
+    # regions, so this cache is shared across regions, and we also cache the averages
+    # for each range so we only compute them when the data changes.
+    headers = {}
+    if _spot_advisor_data is not None:
+        headers["If-None-Match"] = _spot_advisor_data[0]
+    async with _http_get(
+        "https://spot-bid-advisor.s3.amazonaws.com/spot-advisor-data.json",
+        http_session,
+        headers,
+    ) as response:
+        if response.status == 304 and _spot_advisor_data is not None:
+            _, data, average_by_r = _spot_advisor_data
+        else:
+            data = await response.json()
+            average_by_r = _get_average_interruption_probability_by_range(data)
+            if "ETag" in response.headers:
+                _spot_advisor_data = response.headers["ETag"], data, average_by_r
 
     # Get the average interruption probability for Linux instance_types in the specified
-    # region
-    return pd.DataFrame.from_records(
-        [
-            (instance_type, r_to_interruption_probability["average"][values["r"]])
-            for instance_type, values in data["spot_advisor"][region_name][
-                "Linux"
-            ].items()
-        ],
-        columns=["instance_type", "interruption_probability"],
+    # region. These are averages of integer percentages, so float32 is plenty.
+    instance_types_data = data["spot_advisor"][region_name]["Linux"]
+    return pd.DataFrame(
+        {
+            "instance_type": list(instance_types_data.keys()),
+            "interruption_probability": np.array(
+                [average_by_r[values["r"]] for values in instance_types_data.values()],
+                dtype=np.float32,
+            ),
+        }
     )
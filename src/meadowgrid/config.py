@@ -36,6 +36,17 @@ DEFAULT_INTERRUPTION_PROBABILITY_THRESHOLD = 15
 # launched the child process. Mostly for testing/debugging.
 MEADOWGRID_AGENT_PID = "MEADOWGRID_AGENT_PID"
 
+# If this is set, main_in_child_process starts child processes from a forkserver
+# (POSIX only) rather than spawning a new interpreter each time
+MEADOWGRID_CHILD_PROCESS_FORKSERVER = "MEADOWGRID_CHILD_PROCESS_FORKSERVER"
+
 
 # specifies how often EC2 prices should get updated
 EC2_PRICES_UPDATE_SECS = 60 * 30  # 30 minutes
+# on-demand prices change much less often than spot prices, so we cache them on disk
+# for this long. Set MEADOWGRID_REFRESH_EC2_ON_DEMAND_PRICES to ignore the cache
+EC2_ON_DEMAND_PRICES_CACHE_SECS = 60 * 60 * 24  # 1 day
+MEADOWGRID_REFRESH_EC2_ON_DEMAND_PRICES = "MEADOWGRID_REFRESH_EC2_ON_DEMAND_PRICES"
+# When the coordinator starts, it uses the instance types/prices it cached on disk the
+# last time it ran if they're at most this old, while it downloads the latest data
+EC2_INSTANCE_TYPES_CACHE_SECS = 60 * 60 * 24  # 1 day
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import itertools
 import pickle
 import traceback
@@ -69,6 +70,7 @@ from meadowgrid.resource_allocation import (
     update_simple_job_state,
     update_task_state,
 )
+from meadowgrid.shared import pickle_exception
 
 
 def _add_tasks_to_grid_job(grid_job: GridJobState, tasks: Iterable[GridTask]) -> None:
@@ -135,10 +137,25 @@ class MeadowGridCoordinatorHandler(MeadowGridCoordinatorServicer):
         #  lists
 
         self._generic_agents: Dict[str, GenericAgentState] = {}
+        # the element-wise max of total_resources across all of _generic_agents, see
+        # job_num_workers_needed_changed. Agents are never removed from
+        # _generic_agents, so we only ever need to increase this.
+        self._generic_agents_max_total_resources: Optional[Resources] = None
 
         # maps service -> (service_url, credentials)
         self._credentials_dict: CredentialsDict = {}
 
+        # Jobs whose number of workers needed has changed, indexed by job_id. Rather
+        # than calling job_num_workers_needed_changed when e.g. a job is added, we add
+        # the job here and _schedule_jobs_loop calls job_num_workers_needed_changed in
+        # the background. This means we don't block responding to the client, and if
+        # tasks get added to a grid job many times in quick succession, we only need to
+        # schedule the job once.
+        self._jobs_to_schedule: Dict[str, JobState] = {}
+        # _jobs_to_schedule_event and _schedule_jobs_task get created in __aenter__
+        self._jobs_to_schedule_event: Optional[asyncio.Event] = None
+        self._schedule_jobs_task: Optional[asyncio.Task[None]] = None
+
     async def __aenter__(self) -> MeadowGridCoordinatorHandler:
         if self._awaited:
             return self
@@ -152,6 +169,9 @@ class MeadowGridCoordinatorHandler(MeadowGridCoordinatorServicer):
         else:
             raise ValueError(f"Invalid agent_creator_type {self._agent_creator_type}")
 
+        self._jobs_to_schedule_event = asyncio.Event()
+        self._schedule_jobs_task = asyncio.create_task(self._schedule_jobs_loop())
+
         self._awaited = True
 
         return self
@@ -168,9 +188,62 @@ class MeadowGridCoordinatorHandler(MeadowGridCoordinatorServicer):
         return self.__aenter__().__await__()
 
     async def close(self) -> None:
+        if self._schedule_jobs_task is not None:
+            self._schedule_jobs_task.cancel()
+            try:
+                await self._schedule_jobs_task
+            except asyncio.CancelledError:
+                pass
+
         if self._agent_creator is not None:
             await self._agent_creator.close()
 
+    def _job_num_workers_needed_changed(self, job: JobState) -> None:
+        """
+        Schedules a call to job_num_workers_needed_changed for this job, see
+        _jobs_to_schedule
+        """
+        if self._jobs_to_schedule_event is None:
+            raise ValueError(
+                "Must use MeadowGridCoordinatorHandler in an async with block"
+            )
+
+        self._jobs_to_schedule[job.job.job_id] = job
+        self._jobs_to_schedule_event.set()
+
+    async def _schedule_jobs_loop(self) -> None:
+        """Runs forever, see _jobs_to_schedule"""
+        assert self._jobs_to_schedule_event is not None  # just for mypy
+
+        while True:
+            await self._jobs_to_schedule_event.wait()
+            self._jobs_to_schedule_event.clear()
+
+            jobs = list(self._jobs_to_schedule.values())
+            self._jobs_to_schedule.clear()
+
+            for job in jobs:
+                try:
+                    await job_num_workers_needed_changed(
+                        job,
+                        list(self._generic_agents.values()),
+                        self._agent_creator,
+                        self._generic_agents_max_total_resources,
+                    )
+                except Exception as e:
+                    # Fail the job rather than dropping it so that clients polling for
+                    # the job's state see the error instead of a job that never runs
+                    print(f"Error scheduling job {job.job.job_id}, failing the job")
+                    traceback.print_exc()
+                    job.fail_job(
+                        ProcessState(
+                            state=ProcessState.ProcessStateEnum.RUN_REQUEST_FAILED,
+                            pickled_result=pickle_exception(
+                                e, job.job.result_highest_pickle_protocol
+                            ),
+                        )
+                    )
+
     async def _resolve_deployments(self, job: Job) -> None:
         """
         Modifies job in place!!!
@@ -263,10 +336,7 @@ class MeadowGridCoordinatorHandler(MeadowGridCoordinatorServicer):
         else:
             raise ValueError(f"Unknown job_spec {job_spec}")
 
-        # TODO this shouldn't really block responding to the client
-        await job_num_workers_needed_changed(
-            job, list(self._generic_agents.values()), self._agent_creator
-        )
+        self._job_num_workers_needed_changed(job)
 
         return AddJobResponse(state=AddJobResponse.AddJobState.ADDED)
 
@@ -284,10 +354,7 @@ class MeadowGridCoordinatorHandler(MeadowGridCoordinatorServicer):
         if request.all_tasks_added:
             job.all_tasks_added = True
 
-        # TODO this shouldn't really block responding to the client
-        await job_num_workers_needed_changed(
-            job, list(self._generic_agents.values()), self._agent_creator
-        )
+        self._job_num_workers_needed_changed(job)
 
         return AddJobResponse()
 
@@ -449,6 +516,12 @@ class MeadowGridCoordinatorHandler(MeadowGridCoordinatorServicer):
             resources = Resources.from_protobuf(request.resources)
             agent = GenericAgentState(request.agent_id, resources, resources)
             self._generic_agents[request.agent_id] = agent
+            if self._generic_agents_max_total_resources is None:
+                self._generic_agents_max_total_resources = resources
+            else:
+                self._generic_agents_max_total_resources = (
+                    self._generic_agents_max_total_resources.max(resources)
+                )
 
             # give jobs to this agent if appropriate
             agent_available_resources_changed(agent, self._all_jobs())
@@ -619,7 +692,9 @@ async def start_meadowgrid_coordinator(
     meadowflow server at that address.
     """
 
-    server = grpc.aio.server()
+    # responses like get_next_jobs and get_grid_task_states carry pickled functions and
+    # results, which usually compress well
+    server = grpc.aio.server(compression=grpc.Compression.Gzip)
     async with MeadowGridCoordinatorHandler(agent_creator) as handler:
         add_MeadowGridCoordinatorServicer_to_server(handler, server)
         address = f"{host}:{port}"
@@ -343,6 +343,11 @@ def _add_credentials_request(
     return result
 
 
+# Requests like add_job, add_tasks_to_grid_job, and update_grid_task_state_and_get_next
+# carry pickled functions, arguments, and results, which usually compress well
+_GRPC_COMPRESSION = grpc.Compression.Gzip
+
+
 def _grpc_retry_option(
     package: str, service: str
 ) -> Tuple[Literal["grpc.service_config"], str]:
@@ -411,7 +416,9 @@ class MeadowGridCoordinatorClientAsync:
 
     def __init__(self, address: str = DEFAULT_COORDINATOR_ADDRESS):
         self._channel = grpc.aio.insecure_channel(
-            address, options=[_grpc_retry_option("meadowgrid", "MeadowGridCoordinator")]
+            address,
+            options=[_grpc_retry_option("meadowgrid", "MeadowGridCoordinator")],
+            compression=_GRPC_COMPRESSION,
         )
         self._stub = MeadowGridCoordinatorStub(self._channel)
 
@@ -577,7 +584,9 @@ class MeadowGridCoordinatorClientSync:
 
     def __init__(self, address: str = DEFAULT_COORDINATOR_ADDRESS):
         self._channel = grpc.insecure_channel(
-            address, options=[_grpc_retry_option("meadowgrid", "MeadowGridCoordinator")]
+            address,
+            options=[_grpc_retry_option("meadowgrid", "MeadowGridCoordinator")],
+            compression=_GRPC_COMPRESSION,
         )
         self._stub = MeadowGridCoordinatorStub(self._channel)
 
@@ -695,7 +704,9 @@ class MeadowGridCoordinatorClientForWorkersAsync:
 
     def __init__(self, address: str = DEFAULT_COORDINATOR_ADDRESS):
         self._channel = grpc.aio.insecure_channel(
-            address, options=[_grpc_retry_option("meadowgrid", "MeadowGridCoordinator")]
+            address,
+            options=[_grpc_retry_option("meadowgrid", "MeadowGridCoordinator")],
+            compression=_GRPC_COMPRESSION,
         )
         self._stub = MeadowGridCoordinatorStub(self._channel)
 
@@ -793,7 +804,9 @@ class MeadowGridCoordinatorClientForWorkersSync:
 
     def __init__(self, address: str = DEFAULT_COORDINATOR_ADDRESS):
         self._channel = grpc.insecure_channel(
-            address, options=[_grpc_retry_option("meadowgrid", "MeadowGridCoordinator")]
+            address,
+            options=[_grpc_retry_option("meadowgrid", "MeadowGridCoordinator")],
+            compression=_GRPC_COMPRESSION,
         )
         self._stub = MeadowGridCoordinatorStub(self._channel)
 
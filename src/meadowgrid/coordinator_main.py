@@ -1,7 +1,6 @@
 """A runnable script for running a meadowgrid server"""
 import argparse
 import logging
-import multiprocessing
 import asyncio
 import contextlib
 from typing import Iterator, Optional
@@ -9,6 +8,7 @@ from typing import Iterator, Optional
 import meadowgrid.coordinator
 from meadowgrid.agent_creator import AgentCreatorType
 from meadowgrid.config import DEFAULT_COORDINATOR_HOST, DEFAULT_COORDINATOR_PORT
+from meadowgrid.shared import run_in_child_process
 
 
 def main(
@@ -44,23 +44,10 @@ def main_in_child_process(
     it, see logs, etc. If there's an existing server already running, the child process
     will just die immediately without doing anything.
     """
-    ctx = multiprocessing.get_context("spawn")
-    server_process = ctx.Process(
-        target=main, args=(host, port, meadowflow_address, agent_creator)
-    )
-    server_process.start()
-
-    try:
-        logging.info(f"Process started. Pid: {server_process.pid}")
-        yield server_process.pid
-    finally:
-        server_process.terminate()
-        logging.info("Process terminated. Waiting up to 5 seconds for exit...")
-        server_process.join(5)
-        logging.info(f"Process exited with code {server_process.exitcode}")
-        if server_process.is_alive():
-            logging.info("Process alive after termination, killing.")
-            server_process.kill()
+    with run_in_child_process(
+        main, (host, port, meadowflow_address, agent_creator)
+    ) as pid:
+        yield pid
 
 
 def command_line_main() -> None:
@@ -7,7 +7,7 @@ import os.path
 import pkgutil
 import uuid
 import zipfile
-from typing import Any, List, Dict, Tuple, Callable, TypeVar
+from typing import Any, List, Dict, Tuple, Callable, TypeVar, cast
 
 import boto3
 
@@ -35,11 +35,11 @@ from meadowgrid.ec2_alloc_lambda.ec2_alloc_stub import (
     _PUBLIC_ADDRESS,
     _RUNNING_JOBS,
     ignore_boto3_error_code,
+    suppress_boto3_error_code,
 )
 from meadowgrid.resource_allocation import (
     Resources,
     _remaining_resources_sort_key,
-    _assert_is_not_none,
 )
 
 
@@ -132,13 +132,11 @@ def _ensure_meadowgrid_sqs_access_policy(iam_client: Any) -> str:
     grid_task_queue.py
     """
     # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/iam.html#IAM.Client.create_policy
-    ignore_boto3_error_code(
-        lambda: iam_client.create_policy(
+    with suppress_boto3_error_code("EntityAlreadyExists"):
+        iam_client.create_policy(
             PolicyName=_MEADOWGRID_SQS_ACCESS_POLICY_NAME,
             PolicyDocument=_MEADOWGRID_SQS_ACCESS_POLICY_DOCUMENT,
-        ),
-        "EntityAlreadyExists",
-    )
+        )
     return (
         f"arn:aws:iam::{_get_account_number()}:policy/"
         f"{_MEADOWGRID_SQS_ACCESS_POLICY_NAME}"
@@ -148,13 +146,11 @@ def _ensure_meadowgrid_sqs_access_policy(iam_client: Any) -> str:
 def _ensure_ec2_alloc_table_access_policy(iam_client: Any) -> str:
     """Creates a policy that gives permission to read/write the EC2 alloc table"""
     # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/iam.html#IAM.Client.create_policy
-    ignore_boto3_error_code(
-        lambda: iam_client.create_policy(
+    with suppress_boto3_error_code("EntityAlreadyExists"):
+        iam_client.create_policy(
             PolicyName=_EC2_ALLOC_TABLE_ACCESS_POLICY_NAME,
             PolicyDocument=_EC2_TABLE_ACCESS_POLICY_DOCUMENT,
-        ),
-        "EntityAlreadyExists",
-    )
+        )
     return (
         f"arn:aws:iam::{_get_account_number()}:policy/"
         f"{_EC2_ALLOC_TABLE_ACCESS_POLICY_NAME}"
@@ -174,15 +170,13 @@ def _ensure_ec2_alloc_role(region_name: str) -> None:
     if not _iam_role_exists(iam, _EC2_ALLOC_ROLE):
         # create the role
         # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/iam.html#IAM.ServiceResource.create_role
-        ignore_boto3_error_code(
-            lambda: iam.create_role(
+        with suppress_boto3_error_code("EntityAlreadyExists"):
+            iam.create_role(
                 RoleName=_EC2_ALLOC_ROLE,
                 # allow EC2 instances to assume this role
                 AssumeRolePolicyDocument=_EC2_ASSUME_ROLE_POLICY_DOCUMENT,
                 Description="Allows reading/writing the EC2 alloc table",
-            ),
-            "EntityAlreadyExists",
-        )
+            )
 
         # create the table access policy and attach it to the role
         # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/iam.html#IAM.Client.attach_role_policy
@@ -201,19 +195,15 @@ def _ensure_ec2_alloc_role(region_name: str) -> None:
 
         # create an instance profile (so that EC2 instances can assume it) and attach
         # the role to the instance profile
-        ignore_boto3_error_code(
-            lambda: iam.create_instance_profile(
+        with suppress_boto3_error_code("EntityAlreadyExists"):
+            iam.create_instance_profile(
                 InstanceProfileName=_EC2_ALLOC_ROLE_INSTANCE_PROFILE
-            ),
-            "EntityAlreadyExists",
-        )
-        ignore_boto3_error_code(
-            lambda: iam.add_role_to_instance_profile(
+            )
+        with suppress_boto3_error_code("LimitExceeded"):
+            iam.add_role_to_instance_profile(
                 InstanceProfileName=_EC2_ALLOC_ROLE_INSTANCE_PROFILE,
                 RoleName=_EC2_ALLOC_ROLE,
-            ),
-            "LimitExceeded",
-        )
+            )
 
 
 async def _ensure_ec2_alloc_table() -> Any:
@@ -283,8 +273,8 @@ async def _register_ec2_instance(
     now = datetime.datetime.utcnow().isoformat()
     table = await _ensure_ec2_alloc_table()
 
-    success, result = ignore_boto3_error_code(
-        lambda: table.put_item(
+    with suppress_boto3_error_code("ConditionalCheckFailedException"):
+        table.put_item(
             Item={
                 # the public address of the EC2 instance
                 _PUBLIC_ADDRESS: public_address,
@@ -317,18 +307,16 @@ async def _register_ec2_instance(
                 _LAST_UPDATE_TIME: now,
             },
             ConditionExpression=f"attribute_not_exists({_PUBLIC_ADDRESS})",
-        ),
-        "ConditionalCheckFailedException",
-    )
-
-    if not success:
-        # It's possible that an existing EC2 instance crashed unexpectedly, the
-        # coordinator record hasn't been deleted yet, and a new instance was created
-        # that has the same address
-        raise ValueError(
-            f"Tried to register an ec2_instance {public_address} but it already exists,"
-            " this should never happen!"
         )
+        return
+
+    # It's possible that an existing EC2 instance crashed unexpectedly, the
+    # coordinator record hasn't been deleted yet, and a new instance was created
+    # that has the same address
+    raise ValueError(
+        f"Tried to register an ec2_instance {public_address} but it already exists,"
+        " this should never happen!"
+    )
 
 
 def _get_ec2_instances(table: Any) -> List[_EC2InstanceState]:
@@ -432,8 +420,8 @@ def _allocate_job_to_ec2_instance(
             f"attribute_not_exists({_RUNNING_JOBS}.#j{i})"
         )
 
-    success, result = ignore_boto3_error_code(
-        lambda: table.update_item(
+    with suppress_boto3_error_code("ConditionalCheckFailedException"):
+        table.update_item(
             Key={_PUBLIC_ADDRESS: public_address},
             # subtract resources that we're allocating
             UpdateExpression=(
@@ -454,10 +442,9 @@ def _allocate_job_to_ec2_instance(
             ),
             ExpressionAttributeValues=expression_attribute_values,
             ExpressionAttributeNames=expression_attribute_names,
-        ),
-        "ConditionalCheckFailedException",
-    )
-    return success
+        )
+        return True
+    return False
 
 
 async def deallocate_job_from_ec2_instance(
@@ -473,8 +460,8 @@ async def deallocate_job_from_ec2_instance(
     """
     table = await _ensure_ec2_alloc_table()
 
-    success, result = ignore_boto3_error_code(
-        lambda: table.update_item(
+    with suppress_boto3_error_code("ConditionalCheckFailedException"):
+        table.update_item(
             Key={_PUBLIC_ADDRESS: public_address},
             UpdateExpression=(
                 f"SET {_LOGICAL_CPU_AVAILABLE}="
@@ -492,10 +479,9 @@ async def deallocate_job_from_ec2_instance(
                 ":memory_gb_allocated": job[_MEMORY_GB_ALLOCATED],
                 ":now": datetime.datetime.utcnow().isoformat(),
             },
-        ),
-        "ConditionalCheckFailedException",
-    )
-    return success
+        )
+        return True
+    return False
 
 
 async def _choose_existing_ec2_instances(
@@ -553,12 +539,11 @@ async def _choose_existing_ec2_instances(
                 num_jobs_proposed += 1
 
                 # decrease the agent's available_resources
-                chosen_ec2_instance.available_resources = _assert_is_not_none(
-                    (
-                        chosen_ec2_instance.available_resources.subtract(
-                            resources_required_per_job
-                        )
-                    )
+                chosen_ec2_instance.available_resources = cast(
+                    Resources,
+                    chosen_ec2_instance.available_resources.subtract(
+                        resources_required_per_job
+                    ),
                 )
                 # decrease the sort key for the chosen agent
                 sort_keys[chosen_index] = _remaining_resources_sort_key(
@@ -745,16 +730,14 @@ def _ensure_ec2_alloc_lambda_role(region_name: str) -> None:
     if not _iam_role_exists(iam, _EC2_ALLOC_LAMBDA_ROLE):
         # create the role
         # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/iam.html#IAM.ServiceResource.create_role
-        ignore_boto3_error_code(
-            lambda: iam.create_role(
+        with suppress_boto3_error_code("EntityAlreadyExists"):
+            iam.create_role(
                 RoleName=_EC2_ALLOC_LAMBDA_ROLE,
                 # allow EC2 instances to assume this role
                 AssumeRolePolicyDocument=_LAMBDA_ASSUME_ROLE_POLICY_DOCUMENT,
                 Description="Allows reading/writing the EC2 alloc table and "
                 "creating/terminating EC2 instances",
-            ),
-            "EntityAlreadyExists",
-        )
+            )
 
         # allow accessing the EC2 alloc dynamodb table
         # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/iam.html#IAM.Client.attach_role_policy
@@ -789,8 +772,8 @@ async def _create_ec2_alloc_lambda(region_name: str, lambda_client: Any) -> None
 
     # create the lambda
     def create_function_if_not_exists() -> Tuple[bool, None]:
-        ignore_boto3_error_code(
-            lambda: lambda_client.create_function(
+        with suppress_boto3_error_code("ResourceConflictException"):
+            lambda_client.create_function(
                 FunctionName=_EC2_ALLOC_LAMBDA_NAME,
                 Runtime="python3.9",
                 Role=f"arn:aws:iam::{account_number}:role/{_EC2_ALLOC_LAMBDA_ROLE}",
@@ -798,9 +781,7 @@ async def _create_ec2_alloc_lambda(region_name: str, lambda_client: Any) -> None
                 Code={"ZipFile": _get_zipped_lambda_code()},
                 Timeout=120,
                 MemorySize=128,  # memory available in MB
-            ),
-            "ResourceConflictException",
-        )
+            )
         return True, None
 
     # totally crazy, but sometimes you just have to wait 5-10 seconds after
@@ -837,8 +818,8 @@ async def _create_ec2_alloc_lambda(region_name: str, lambda_client: Any) -> None
 
     # add permissions for that rule to invoke this lambda
     # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/lambda.html#Lambda.Client.add_permission
-    ignore_boto3_error_code(
-        lambda: lambda_client.add_permission(
+    with suppress_boto3_error_code("ResourceConflictException"):
+        lambda_client.add_permission(
             FunctionName=_EC2_ALLOC_LAMBDA_NAME,
             StatementId=f"{_EC2_ALLOC_LAMBDA_SCHEDULE_RULE}_invokes_"
             f"{_EC2_ALLOC_LAMBDA_NAME}",
@@ -846,9 +827,7 @@ async def _create_ec2_alloc_lambda(region_name: str, lambda_client: Any) -> None
             Principal="events.amazonaws.com",
             SourceArn=f"arn:aws:events:us-east-2:{account_number}:rule/"
             f"{_EC2_ALLOC_LAMBDA_SCHEDULE_RULE}",
-        ),
-        "ResourceConflictException",
-    )
+        )
 
 
 async def ensure_ec2_alloc_lambda(update_if_exists: bool = False) -> None:
@@ -899,29 +878,23 @@ def delete_meadowgrid_resources(region_name: str) -> None:
     iam.delete_instance_profile(InstanceProfileName=_EC2_ALLOC_ROLE_INSTANCE_PROFILE)
 
     _detach_all_policies(iam, _EC2_ALLOC_ROLE)
-    ignore_boto3_error_code(
-        lambda: iam.delete_role(RoleName=_EC2_ALLOC_ROLE), "NoSuchEntity"
-    )
+    with suppress_boto3_error_code("NoSuchEntity"):
+        iam.delete_role(RoleName=_EC2_ALLOC_ROLE)
 
     _detach_all_policies(iam, _EC2_ALLOC_LAMBDA_ROLE)
-    ignore_boto3_error_code(
-        lambda: iam.delete_role(RoleName=_EC2_ALLOC_LAMBDA_ROLE), "NoSuchEntity"
-    )
+    with suppress_boto3_error_code("NoSuchEntity"):
+        iam.delete_role(RoleName=_EC2_ALLOC_LAMBDA_ROLE)
 
     table_access_policy_arn = _ensure_ec2_alloc_table_access_policy(iam)
-    ignore_boto3_error_code(
-        lambda: iam.delete_policy(PolicyArn=table_access_policy_arn), "NoSuchEntity"
-    )
+    with suppress_boto3_error_code("NoSuchEntity"):
+        iam.delete_policy(PolicyArn=table_access_policy_arn)
 
     sqs_access_policy_arn = _ensure_meadowgrid_sqs_access_policy(iam)
-    ignore_boto3_error_code(
-        lambda: iam.delete_policy(PolicyArn=sqs_access_policy_arn), "NoSuchEntity"
-    )
+    with suppress_boto3_error_code("NoSuchEntity"):
+        iam.delete_policy(PolicyArn=sqs_access_policy_arn)
 
     lambda_client = boto3.client("lambda", region_name=region_name)
-    ignore_boto3_error_code(
-        lambda: lambda_client.delete_function(FunctionName=_EC2_ALLOC_LAMBDA_NAME),
-        "ResourceNotFoundException",
-    )
+    with suppress_boto3_error_code("ResourceNotFoundException"):
+        lambda_client.delete_function(FunctionName=_EC2_ALLOC_LAMBDA_NAME)
 
     # TODO also delete other resources like security groups, dynamodb table, SQS queues
@@ -15,7 +15,7 @@ from meadowgrid.ec2_alloc_lambda.ec2_alloc_stub import (
     _LAST_UPDATE_TIME,
     _PUBLIC_ADDRESS,
     _RUNNING_JOBS,
-    ignore_boto3_error_code,
+    suppress_boto3_error_code,
 )
 
 
@@ -83,13 +83,12 @@ def _deregister_ec2_instance(
         optional_args["ConditionExpression"] = f"size({_RUNNING_JOBS}) = :zero"
         optional_args["ExpressionAttributeValues"] = {":zero": 0}
 
-    success, result = ignore_boto3_error_code(
-        lambda: _get_ec2_alloc_table().delete_item(
+    with suppress_boto3_error_code("ConditionalCheckFailedException"):
+        _get_ec2_alloc_table().delete_item(
             Key={_PUBLIC_ADDRESS: public_address}, **optional_args
-        ),
-        "ConditionalCheckFailedException",
-    )
-    return success
+        )
+        return True
+    return False
 
 
 _NON_TERMINATED_EC2_STATES = [
@@ -7,13 +7,16 @@ should not refer to any outside code
 """
 from __future__ import annotations
 
-from typing import Callable, Tuple, Optional, TypeVar
+import contextlib
+from typing import Callable, Iterator, Tuple, Optional, TypeVar
 
 import botocore.exceptions
 
 
 _T = TypeVar("_T")
 
+_ClientError = botocore.exceptions.ClientError
+
 # a dynamodb table that holds information about EC2 instances we've created and what has
 # been allocated to which instances
 _EC2_ALLOC_TABLE_NAME = "_meadowgrid_ec2_alloc_table"
@@ -45,10 +48,26 @@ def ignore_boto3_error_code(
     """
     try:
         return True, func()
-    except botocore.exceptions.ClientError as e:
+    except _ClientError as e:
         if "Error" in e.response:
             error = e.response["Error"]
             if "Code" in error and error["Code"] == error_code:
                 return False, None
 
         raise
+
+
+@contextlib.contextmanager
+def suppress_boto3_error_code(error_code: str) -> Iterator[None]:
+    """
+    Like ignore_boto3_error_code, but as a context manager. A boto3 error with the
+    specified code raised in the body is suppressed, any other exception is raised
+    normally. This avoids creating a lambda and a result tuple for every call, so
+    prefer it for calls that are made often, e.g. conditional writes to the EC2 alloc
+    table.
+    """
+    try:
+        yield
+    except _ClientError as e:
+        if e.response.get("Error", {}).get("Code") != error_code:
+            raise
@@ -105,6 +105,9 @@ class LocalAgentCreator(AgentCreator):
         await self._query_prices_task
         return self._instance_types
 
+    def get_instance_types_cached(self) -> Optional[pd.DataFrame]:
+        return self._instance_types
+
     async def launch_job_specific_agent(
         self,
         agent_id: str,
@@ -11,10 +11,12 @@ import abc
 import asyncio
 import collections
 import dataclasses
+import heapq
+import itertools
 import random
 import traceback
 import uuid
-from typing import Dict, List, Iterable, Optional, Tuple
+from typing import Any, Dict, List, Iterable, Optional, Tuple, cast
 
 import meadowgrid.agent_creator
 from meadowgrid.config import MEMORY_GB, LOGICAL_CPU
@@ -23,10 +25,9 @@ from meadowgrid.meadowgrid_pb2 import Resource, Job, ProcessState
 from meadowgrid.shared import COMPLETED_PROCESS_STATES
 
 
-def _assert_is_not_none(resources: Optional[Resources]) -> Resources:
-    """A helper for mypy"""
-    assert resources is not None
-    return resources
+# The maximum number of job-specific agents that _create_agents_for_job will be
+# launching at the same time
+_MAX_CONCURRENT_AGENT_LAUNCHES = 16
 
 
 @dataclasses.dataclass(frozen=True)
@@ -36,10 +37,52 @@ class Resources:
     required (i.e. by a job)
     """
 
+    # We construct a lot of these while scheduling, so we avoid a per-instance __dict__.
+    # (dataclass(slots=True) requires python 3.10.)
+    __slots__ = ("memory_gb", "logical_cpu", "custom")
+
     memory_gb: float
     logical_cpu: int
     custom: Dict[str, float]
 
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # The default pickling for a class with __slots__ sets each attribute after
+        # construction, which fails for a frozen dataclass, so we pickle (and copy) a
+        # constructor call instead
+        return Resources, (self.memory_gb, self.logical_cpu, self.custom)
+
+    def __hash__(self) -> int:
+        # The hash that dataclass generates would fail because custom is a dict
+        return hash((self.memory_gb, self.logical_cpu, frozenset(self.custom.items())))
+
+    def is_zero(self) -> bool:
+        """
+        Returns True if all of the resource amounts are zero, i.e. adding this to
+        another Resources wouldn't change any of its amounts.
+        """
+        return (
+            self.memory_gb == 0
+            and self.logical_cpu == 0
+            and not any(self.custom.values())
+        )
+
+    def can_subtract(self, required: Resources) -> bool:
+        """
+        Returns True if "resources required" for a job are available in self, i.e. if
+        subtract would not return None. This doesn't construct any new objects, so it's
+        cheaper than subtract when we only need to check whether a job fits.
+        """
+        if self.memory_gb < required.memory_gb:
+            return False
+        if self.logical_cpu < required.logical_cpu:
+            return False
+        for key, value in required.custom.items():
+            if key not in self.custom:
+                return False
+            if self.custom[key] < value:
+                return False
+        return True
+
     def subtract(self, required: Resources) -> Optional[Resources]:
         """
         Subtracts "resources required" for a job from self, which is interpreted as
@@ -47,23 +90,23 @@ class Resources:
 
         Returns None if the required resources are not available in self.
         """
-        if self.memory_gb < required.memory_gb:
-            return None
-        if self.logical_cpu < required.logical_cpu:
+        if not self.can_subtract(required):
             return None
-        for key, value in required.custom.items():
-            if key not in self.custom:
-                return None
-            if self.custom[key] < required.custom[key]:
-                return None
+
+        # Most jobs don't require any custom resources, so we avoid going through
+        # self.custom in that case
+        if not required.custom:
+            custom = self.custom.copy()
+        else:
+            custom = {
+                key: value - required.custom.get(key, 0)
+                for key, value in self.custom.items()
+            }
 
         return Resources(
             self.memory_gb - required.memory_gb,
             self.logical_cpu - required.logical_cpu,
-            {
-                key: value - required.custom.get(key, 0)
-                for key, value in self.custom.items()
-            },
+            custom,
         )
 
     def add(self, returned: Resources) -> Resources:
@@ -71,13 +114,42 @@ class Resources:
         Adds back "resources required" for a job to self, which is usually resources
         available on a agent.
         """
+        # Usually neither side has custom resources or both sides have the same keys, so
+        # we avoid building a union of the keys in those cases
+        if not returned.custom:
+            custom = self.custom.copy()
+        elif not self.custom:
+            custom = returned.custom.copy()
+        elif self.custom.keys() == returned.custom.keys():
+            custom = {
+                key: value + returned.custom[key] for key, value in self.custom.items()
+            }
+        else:
+            custom = {
+                key: self.custom.get(key, 0) + returned.custom.get(key, 0)
+                for key in set().union(self.custom, returned.custom)
+            }
+
         return Resources(
             self.memory_gb + returned.memory_gb,
             self.logical_cpu + returned.logical_cpu,
-            {
-                key: self.custom.get(key, 0) + returned.custom.get(key, 0)
-                for key in set().union(self.custom, returned.custom)
-            },
+            custom,
+        )
+
+    def max(self, other: Resources) -> Resources:
+        """
+        Returns the element-wise max of self and other. For custom resources that only
+        exist in one of self and other, we just take the value that exists.
+        """
+        custom = self.custom.copy()
+        for key, value in other.custom.items():
+            if key not in custom or custom[key] < value:
+                custom[key] = value
+
+        return Resources(
+            max(self.memory_gb, other.memory_gb),
+            max(self.logical_cpu, other.logical_cpu),
+            custom,
         )
 
     @classmethod
@@ -300,13 +372,14 @@ class SimpleJobState(JobState):
     def get_pending_workers_for_agent(
         self, agent: AgentState
     ) -> Iterable[Optional[str]]:
+        worker = self.worker
         if (
-            self.worker is not None
-            and agent.agent_id == self.worker.agent.agent_id
-            and self.worker.is_pending
+            worker is not None
+            and worker.is_pending
+            and agent.agent_id == worker.agent.agent_id
             and self.state.state not in COMPLETED_PROCESS_STATES
         ):
-            self.worker.is_pending = False
+            worker.is_pending = False
             yield None
 
     def fail_job(self, state: ProcessState) -> None:
@@ -326,6 +399,8 @@ class SimpleJobWorkerState:
     especially for keeping track of is_pending.
     """
 
+    __slots__ = ("agent", "is_pending")
+
     agent: AgentState
     is_pending: bool
 
@@ -351,33 +426,55 @@ class GridJobState(JobState):
     # all of the GridWorkers that are pending or have been created for this job, indexed
     # by the grid_worker_id
     grid_workers: Dict[str, GridWorkerState] = dataclasses.field(default_factory=dict)
+    # The GridWorkers in grid_workers that are still pending, indexed by agent_id, so
+    # that get_pending_workers_for_agent doesn't need to look through all grid_workers
+    _pending_grid_workers_by_agent: Dict[
+        str, List[GridWorkerState]
+    ] = dataclasses.field(default_factory=dict)
+    # The number of GridWorkers in grid_workers whose grid_task is None, i.e. they
+    # haven't picked up a task yet. A GridWorker's grid_task never goes back to None, so
+    # this only changes in create_pending_worker and set_grid_task.
+    _num_grid_workers_without_task: int = 0
 
     def num_workers_needed(self) -> int:
         # TODO it's possible we shouldn't just blindly create workers as we do here,
         #  e.g. if it takes a long time for a new agent to get going but the tasks are
         #  very short, creating as many workers as there are tasks might not be smart
-        return len(self.unassigned_tasks) - sum(
-            1 for w in self.grid_workers.values() if w.grid_task is None
-        )
+        return len(self.unassigned_tasks) - self._num_grid_workers_without_task
 
     def create_pending_worker(self, agent: AgentState) -> None:
         new_grid_worker = GridWorkerState(str(uuid.uuid4()), agent, None, True)
         self.grid_workers[new_grid_worker.grid_worker_id] = new_grid_worker
+        self._num_grid_workers_without_task += 1
+        self._pending_grid_workers_by_agent.setdefault(agent.agent_id, []).append(
+            new_grid_worker
+        )
 
     def get_pending_workers_for_agent(
         self, agent: AgentState
     ) -> Iterable[Optional[str]]:
-        # TODO there could be a lookup for this
-        for grid_worker in self.grid_workers.values():
-            if grid_worker.agent.agent_id == agent.agent_id and grid_worker.is_pending:
-                grid_worker.is_pending = False
-                yield grid_worker.grid_worker_id
+        for grid_worker in self._pending_grid_workers_by_agent.pop(agent.agent_id, ()):
+            grid_worker.is_pending = False
+            yield grid_worker.grid_worker_id
+
+    def set_grid_task(
+        self, grid_worker: GridWorkerState, grid_task: GridTaskState
+    ) -> None:
+        """
+        Sets grid_worker.grid_task. This should always be used rather than setting
+        grid_task directly so that we can keep track of how many GridWorkers don't
+        have a task yet.
+        """
+        if grid_worker.grid_task is None:
+            self._num_grid_workers_without_task -= 1
+        grid_worker.grid_task = grid_task
 
     def fail_job(self, state: ProcessState) -> None:
-        while len(self.unassigned_tasks) > 0:
-            self.unassigned_tasks.popleft().state = state
-            # TODO is it okay that tasks that are already running on a GridWorker keep
-            #  going? (Shouldn't happen with current usage)
+        for task in self.unassigned_tasks:
+            task.state = state
+        self.unassigned_tasks.clear()
+        # TODO is it okay that tasks that are already running on a GridWorker keep
+        #  going? (Shouldn't happen with current usage)
 
 
 @dataclasses.dataclass
@@ -401,6 +498,8 @@ class GridWorkerState:
       (current_grid_task will continue to be set to the last task that was worked on)
     """
 
+    __slots__ = ("grid_worker_id", "agent", "grid_task", "is_pending")
+
     # constants
 
     grid_worker_id: str
@@ -431,11 +530,16 @@ async def job_num_workers_needed_changed(
     job: JobState,
     generic_agents: List[GenericAgentState],
     agent_creator: Optional[meadowgrid.agent_creator.AgentCreator],
+    generic_agents_max_total_resources: Optional[Resources] = None,
 ) -> None:
     """
     This function should be called by the coordinator whenever the number of workers
     needed changes for a job, e.g. the job is created or tasks are added to a grid job.
     agents should be the list of all available agents.
+
+    generic_agents_max_total_resources is optional, and should be the element-wise max
+    of total_resources across all of generic_agents. If it is provided, we can often
+    avoid checking every agent to see whether the job could ever run on them.
     """
     num_workers_needed = job.num_workers_needed()
     if num_workers_needed <= 0:
@@ -465,9 +569,21 @@ async def job_num_workers_needed_changed(
     # TODO consider possibility that we can't create agents now but we would be able to
     # later e.g. because there is a global limit on how many EC2 instances we can create
     # right now.
-    if workers_created == 0 and all(
-        worker.total_resources.subtract(job.resources_required) is None
-        for worker in generic_agents
+    # generic_agents_max_total_resources is an upper bound on every agent's
+    # total_resources, so if the job doesn't fit in that, it can't fit on any agent. If
+    # it does fit, we still need to check each agent, as e.g. the max memory and max
+    # logical_cpu might come from different agents.
+    if workers_created == 0 and (
+        (
+            generic_agents_max_total_resources is not None
+            and not generic_agents_max_total_resources.can_subtract(
+                job.resources_required
+            )
+        )
+        or not any(
+            worker.total_resources.can_subtract(job.resources_required)
+            for worker in generic_agents
+        )
     ):
         job.fail_job(
             ProcessState(state=ProcessState.ProcessStateEnum.RESOURCES_NOT_AVAILABLE)
@@ -505,12 +621,19 @@ def _remaining_resources_sort_key(
      reserve resources and no future jobs come along, then you're just making the
      current job run slower for no reason.
     """
-    remaining_resources = available_resources.subtract(resources_required)
-    if remaining_resources is not None:
-        # 0 is an indicator saying we can run this job
+    if available_resources.can_subtract(resources_required):
+        # 0 is an indicator saying we can run this job. We compute the remaining
+        # resources directly rather than constructing them with
+        # available_resources.subtract, as this gets called for every agent whenever we
+        # schedule a job.
         return 0, (
-            sum(remaining_resources.custom.values()),
-            remaining_resources.memory_gb + 2 * remaining_resources.logical_cpu,
+            sum(
+                value - resources_required.custom.get(key, 0)
+                for key, value in available_resources.custom.items()
+            ),
+            available_resources.memory_gb
+            - resources_required.memory_gb
+            + 2 * (available_resources.logical_cpu - resources_required.logical_cpu),
         )
     else:
         # 1 is an indicator saying we cannot run this job
@@ -527,36 +650,41 @@ def _create_workers_for_job_on_generic_agents(
     Returns how many workers were created
     """
 
-    sort_keys = [
-        _remaining_resources_sort_key(agent.available_resources, job.resources_required)
-        for agent in generic_agents
-    ]
+    # A min-heap of (remaining_resources_sort_key, index into generic_agents) for just
+    # the agents that can run our job, so that choosing an agent for each worker is
+    # O(log(number of agents)) rather than a scan over all agents. Ties are broken by
+    # the index, i.e. we prefer agents that come earlier in generic_agents.
+    heap: List[Tuple[Tuple[float, float], int]] = []
+    for i, agent in enumerate(generic_agents):
+        _, sort_key = _remaining_resources_sort_key(
+            agent.available_resources, job.resources_required
+        )
+        if sort_key is not None:
+            heap.append((sort_key, i))
+    heapq.heapify(heap)
 
     num_workers_created = 0
 
-    if sort_keys:
-        while num_workers_created < num_workers_needed:
-            # choose an agent
-            chosen_index = min(range(len(sort_keys)), key=lambda i: sort_keys[i])
-            # if the indicator is 1, that means none of the agents can run our job
-            if sort_keys[chosen_index][0] == 1:
-                break
-
-            # we successfully chose an agent!
-            chosen_agent = generic_agents[chosen_index]
-            # decrease the agent's available_resources
-            chosen_agent.available_resources = _assert_is_not_none(
-                chosen_agent.available_resources.subtract(job.resources_required)
-            )
-            # decrease the sort key for the chosen agent
-            sort_keys[chosen_index] = _remaining_resources_sort_key(
-                chosen_agent.available_resources, job.resources_required
-            )
-            # create the pending worker and add it to the agent
-            job.create_pending_worker(chosen_agent)
-            chosen_agent.add_pending_worker(job)
+    # if the heap is empty, that means none of the agents can run our job
+    while num_workers_created < num_workers_needed and heap:
+        # choose an agent
+        _, chosen_index = heapq.heappop(heap)
+        chosen_agent = generic_agents[chosen_index]
+        # decrease the agent's available_resources
+        chosen_agent.available_resources = cast(
+            Resources, chosen_agent.available_resources.subtract(job.resources_required)
+        )
+        # put the chosen agent back with its new sort key if it can run another worker
+        _, sort_key = _remaining_resources_sort_key(
+            chosen_agent.available_resources, job.resources_required
+        )
+        if sort_key is not None:
+            heapq.heappush(heap, (sort_key, chosen_index))
+        # create the pending worker and add it to the agent
+        job.create_pending_worker(chosen_agent)
+        chosen_agent.add_pending_worker(job)
 
-            num_workers_created += 1
+        num_workers_created += 1
 
     return num_workers_created
 
@@ -568,15 +696,17 @@ async def _create_agents_for_job(
     if job.resources_required.custom:
         return 0
 
-    instance_types = await agent_creator.get_instance_types()
-    # we need to re-compute this--during the await, it's possible that generic agents
-    # became available and were assigned to work on this job, so we no longer need to
-    # create job-specific agents
+    instance_types = agent_creator.get_instance_types_cached()
+    if instance_types is None:
+        instance_types = await agent_creator.get_instance_types()
+    # we need to re-compute this--during the await (if there was one), it's possible
+    # that generic agents became available and were assigned to work on this job, so we
+    # no longer need to create job-specific agents
     num_workers_needed = job.num_workers_needed()
     if instance_types is None or num_workers_needed == 0:
         return 0
 
-    chosen_instance_types = meadowgrid.agent_creator.choose_instance_types_for_job(
+    chosen_instance_types = agent_creator.choose_instance_types_for_job(
         job.resources_required,
         num_workers_needed,
         job.job.interruption_probability_threshold,
@@ -585,24 +715,45 @@ async def _create_agents_for_job(
 
     num_workers_created = 0
 
-    launch_agent_tasks = []
+    # We start launching each agent as soon as we've decided to create it, so that the
+    # launches overlap with setting up the rest of the agents, but we limit how many
+    # launches we have in flight at the same time.
+    launch_semaphore = asyncio.Semaphore(_MAX_CONCURRENT_AGENT_LAUNCHES)
+
+    async def launch_agent(
+        agent_id: str,
+        instance_type: str,
+        on_demand_or_spot: meadowgrid.agent_creator.OnDemandOrSpotType,
+    ) -> None:
+        async with launch_semaphore:
+            await agent_creator.launch_job_specific_agent(
+                agent_id, job.job.job_id, instance_type, on_demand_or_spot
+            )
 
-    for row in chosen_instance_types.itertuples():
-        num_instances = row.num_instances  # type: ignore[attr-defined]
-        instance_type = row.instance_type  # type: ignore[attr-defined]
-        on_demand_or_spot = row.on_demand_or_spot  # type: ignore[attr-defined]
-        memory_gb = row.memory_gb  # type: ignore[attr-defined]
-        logical_cpu = row.logical_cpu  # type: ignore[attr-defined]
-        workers_per_instance = row.workers_per_instance  # type: ignore[attr-defined]
+    launch_agent_tasks = []
 
+    # We go through the columns we need as python lists rather than using itertuples,
+    # which constructs a namedtuple for each row
+    for (
+        num_instances,
+        instance_type,
+        on_demand_or_spot,
+        memory_gb,
+        logical_cpu,
+        workers_per_instance,
+    ) in zip(
+        chosen_instance_types["num_instances"].tolist(),
+        chosen_instance_types["instance_type"].tolist(),
+        chosen_instance_types["on_demand_or_spot"].tolist(),
+        chosen_instance_types["memory_gb"].tolist(),
+        chosen_instance_types["logical_cpu"].tolist(),
+        chosen_instance_types["workers_per_instance"].tolist(),
+    ):
         for _ in range(num_instances):
             agent_id = str(uuid.uuid4())
             launch_agent_tasks.append(
-                agent_creator.launch_job_specific_agent(
-                    agent_id,
-                    job.job.job_id,
-                    instance_type,
-                    on_demand_or_spot,
+                asyncio.create_task(
+                    launch_agent(agent_id, instance_type, on_demand_or_spot)
                 )
             )
 
@@ -620,8 +771,9 @@ async def _create_agents_for_job(
                 num_workers_needed - num_workers_created, workers_per_instance
             )
             for _ in range(workers_to_create):
-                agent.available_resources = _assert_is_not_none(
-                    agent.available_resources.subtract(job.resources_required)
+                agent.available_resources = cast(
+                    Resources,
+                    agent.available_resources.subtract(job.resources_required),
                 )
                 job.create_pending_worker(agent)
 
@@ -634,13 +786,9 @@ async def _create_agents_for_job(
 
     results = await asyncio.gather(*launch_agent_tasks, return_exceptions=True)
     errors = [
-        "\n".join(
-            traceback.format_exception(
-                etype=type(result), value=result, tb=result.__traceback__
-            )
-        )
+        "".join(traceback.format_exception(type(result), result, result.__traceback__))
         for result in results
-        if result is not None
+        if isinstance(result, BaseException)
     ]
     if errors:
         # TODO this is potentially survivable, e.g. we should be able to retry, and even
@@ -657,31 +805,46 @@ def agent_available_resources_changed(agent: AgentState, jobs: List[JobState]) -
     either due to the agent being brand new or an agent's worker exiting. This will
     create new pending workers for the agent. jobs should be the list of all jobs.
     """
-    while True:
-        # jobs that still need workers and "fit" on the agent
+    # jobs that still need workers and "fit" on the agent
+    available_jobs = [
+        job
+        for job in jobs
+        if job.num_workers_needed() > 0
+        and agent.available_resources.can_subtract(job.resources_required)
+    ]
+    cumulative_priorities = list(
+        itertools.accumulate(job.job.priority for job in available_jobs)
+    )
+
+    while len(available_jobs) > 0:
+        # Choose a job. See the docstring on Job.priority in meadowgrid.proto for how
+        # job.priority is used.
+        (chosen_job,) = random.choices(
+            available_jobs, cum_weights=cumulative_priorities
+        )
+
+        # decrease the agent's available_resources
+        agent.available_resources = cast(
+            Resources, agent.available_resources.subtract(chosen_job.resources_required)
+        )
+        # create the pending worker and add it to the agent
+        chosen_job.create_pending_worker(agent)
+        agent.add_pending_worker(chosen_job)
+
+        # Only the chosen job's num_workers_needed has changed, but any job might no
+        # longer fit on the agent. We only need to recompute the cumulative priorities
+        # if that removed any jobs.
+        num_available_jobs = len(available_jobs)
         available_jobs = [
             job
-            for job in jobs
-            if job.num_workers_needed() > 0
-            and agent.available_resources.subtract(job.resources_required) is not None
+            for job in available_jobs
+            if (job is not chosen_job or job.num_workers_needed() > 0)
+            and agent.available_resources.can_subtract(job.resources_required)
         ]
-
-        if len(available_jobs) > 0:
-            # Choose a job. See the docstring on Job.priority in meadowgrid.proto for
-            # how job.priority is used.
-            job = random.choices(
-                available_jobs, [job.job.priority for job in available_jobs]
-            )[0]
-
-            # decrease the agent's available_resources
-            agent.available_resources = _assert_is_not_none(
-                agent.available_resources.subtract(job.resources_required)
+        if len(available_jobs) != num_available_jobs:
+            cumulative_priorities = list(
+                itertools.accumulate(job.job.priority for job in available_jobs)
             )
-            # create the pending worker and add it to the agent
-            job.create_pending_worker(agent)
-            agent.add_pending_worker(job)
-        else:
-            break
 
 
 # TODO we're missing a major function here agent_died_prematurely
@@ -698,7 +861,7 @@ def assign_task_to_grid_worker(
     if len(job.unassigned_tasks) > 0:
         chosen_task = job.unassigned_tasks.popleft()
         # TODO add a timeout for if the grid_worker never comes back with a state
-        grid_worker.grid_task = chosen_task
+        job.set_grid_task(grid_worker, chosen_task)
         return chosen_task
     else:
         return None
@@ -756,7 +919,7 @@ def update_grid_job_state(
                 # failure.
                 if len(job.unassigned_tasks) > 0:
                     grid_task = job.unassigned_tasks.popleft()
-                    grid_worker.grid_task = grid_task
+                    job.set_grid_task(grid_worker, grid_task)
                     grid_task.state = state
                 else:
                     print(
@@ -766,6 +929,8 @@ def update_grid_job_state(
                     )
 
         # if a GridWorker exited, the agent needs to reclaim its resources
+        if job.resources_required.is_zero():
+            return False
         agent.available_resources = agent.available_resources.add(
             job.resources_required
         )
@@ -782,7 +947,10 @@ def update_simple_job_state(
     # TODO we should probably make it so that the state of the job can't "regress", e.g.
     #  go from SUCCEEDED to RUNNING.
     job.state = state
-    if job.state.state in COMPLETED_PROCESS_STATES:
+    if (
+        job.state.state in COMPLETED_PROCESS_STATES
+        and not job.resources_required.is_zero()
+    ):
         agent.available_resources = agent.available_resources.add(
             job.resources_required
         )
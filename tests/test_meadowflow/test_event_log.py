@@ -102,3 +102,51 @@ async def test_subscribe_idempotence(
         called.wait(), timeout=1
     )  # wait for subscribers to get called
     assert called.is_set() is True
+
+
+@pytest.mark.asyncio
+async def test_subscribe_payload_type(event_log: EventLog) -> None:
+    called = asyncio.Event()
+
+    async def call(low: Timestamp, high: Timestamp, events: List[Event]) -> None:
+        nonlocal called
+        assert called.is_set() is False  # checks only called once
+        called.set()
+        assert len(events) == 1
+        assert events[0].topic_name == pname("B")
+        assert events[0].payload == 1
+
+    event_log.subscribe(None, call, int)
+
+    event_log.append_event(pname("A"), "waiting")
+    await asyncio.sleep(delay=0.1)  # wait for subscribers to get called
+    assert called.is_set() is False
+
+    event_log.append_event(pname("B"), 1)
+    await asyncio.wait_for(
+        called.wait(), timeout=1
+    )  # wait for subscribers to get called
+    assert called.is_set() is True
+
+
+@pytest.mark.asyncio
+async def test_subscribe_topic_and_payload_type(event_log: EventLog) -> None:
+    # a subscriber that is subscribed to a topic and to overlapping payload types should
+    # still only see each event once
+    received: List[Event] = []
+
+    async def call(low: Timestamp, high: Timestamp, events: List[Event]) -> None:
+        received.extend(events)
+
+    event_log.subscribe([pname("A")], call)
+    event_log.subscribe(None, call, int)
+    event_log.subscribe(None, call, object)
+
+    event_log.append_event(pname("A"), 1)
+    event_log.append_event(pname("B"), "waiting")
+    await asyncio.sleep(delay=0.1)  # wait for subscribers to get called
+
+    assert [(e.topic_name, e.payload) for e in received] == [
+        (pname("B"), "waiting"),
+        (pname("A"), 1),
+    ]
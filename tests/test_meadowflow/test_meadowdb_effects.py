@@ -258,6 +258,100 @@ async def test_meadowdb_dependency(mdb_data_dir):
         assert_b_events(10, 7, 7, 4)
 
 
+def _write_table(mdb_data_dir, table_name):
+    """Create a fake job that writes to the specified table"""
+    conn = meadowdb.Connection(meadowdb.TableVersionsClientLocal(mdb_data_dir))
+    conn.write(table_name, pd.DataFrame({"col1": [1, 2, 3]}))
+    # TODO this should happen automatically in meadowdb
+    conn.table_versions_client._save_table_versions()
+
+
+def _read_tables(mdb_data_dir, table_names):
+    """Create a fake job that reads from the specified tables"""
+    conn = meadowdb.Connection(meadowdb.TableVersionsClientLocal(mdb_data_dir))
+    for table_name in table_names:
+        conn.read(table_name).to_pd()
+
+
+@pytest.mark.asyncio
+async def test_meadowdb_dependencies_table(mdb_data_dir):
+    """
+    Tests that Scheduler._meadowdb_dependencies_table stays in sync with what each
+    MeadowdbDynamicDependency read the last time its job ran
+    """
+    table_a = (MAIN_USERSPACE_NAME, "A")
+    table_b = (MAIN_USERSPACE_NAME, "B")
+
+    def dependent_job(name):
+        return Job(
+            pname(name),
+            LocalFunction(_read_tables, [mdb_data_dir, ["A"]]),
+            [TriggerAction(Actions.run, [MeadowdbDynamicDependency(ALL_SCOPES)])],
+        )
+
+    async with Scheduler(job_runner_poll_delay_seconds=0.05) as scheduler:
+        scheduler.add_jobs(
+            [
+                Job(pname("W_A"), LocalFunction(_write_table, [mdb_data_dir, "A"]), []),
+                Job(pname("W_B"), LocalFunction(_write_table, [mdb_data_dir, "B"]), []),
+                dependent_job("R1"),
+                dependent_job("R2"),
+            ]
+        )
+
+        def tables_index():
+            return {
+                table: names
+                for (_, table), names in (
+                    scheduler._meadowdb_dependencies_table.items()
+                )
+            }
+
+        def assert_r_events(r1: int, r2: int) -> None:
+            assert r1 == len(scheduler.events_of(pname("R1")))
+            assert r2 == len(scheduler.events_of(pname("R2")))
+
+        async def run(name, overrides=None):
+            scheduler.manual_run(pname(name), overrides)
+            await _wait_for_scheduler(scheduler)
+            assert scheduler.all_are_waiting()
+
+        # nothing has read anything yet, so writes don't trigger anything
+        await run("W_A")
+        await run("W_B")
+        assert tables_index() == {}
+        assert_r_events(1, 1)
+
+        # once R1 and R2 have run, they're indexed by the table they read
+        await run("R1")
+        await run("R2")
+        assert tables_index() == {table_a: {pname("R1"), pname("R2")}}
+        assert_r_events(4, 4)
+
+        # writing to A triggers both of them
+        await run("W_A")
+        assert_r_events(7, 7)
+        assert tables_index() == {table_a: {pname("R1"), pname("R2")}}
+
+        # R1 now reads B instead of A, so it moves to B in the index
+        await run("R1", JobRunOverrides(function_args=[mdb_data_dir, ["B"]]))
+        assert tables_index() == {table_a: {pname("R2")}, table_b: {pname("R1")}}
+        assert_r_events(10, 7)
+        await run("W_A")
+        assert_r_events(10, 10)
+
+        # writing to B triggers R1, which reads A again, so B drops out of the index
+        await run("W_B")
+        assert_r_events(13, 10)
+        assert tables_index() == {table_a: {pname("R1"), pname("R2")}}
+
+        # if R1 doesn't read anything, it isn't in the index at all
+        await run("R1", JobRunOverrides(function_args=[mdb_data_dir, []]))
+        assert tables_index() == {table_a: {pname("R2")}}
+        await run("W_A")
+        assert_r_events(16, 13)
+
+
 _write_on_third_try_runs = 0
 
 
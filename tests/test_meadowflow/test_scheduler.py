@@ -2,7 +2,17 @@ import asyncio
 import datetime
 import pytest
 import time
-from typing import Any, Sequence, Callable, List, Optional
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
 import pytz
 
@@ -12,7 +22,7 @@ import meadowflow.server.server_main
 import meadowflow.time_event_publisher
 import meadowgrid.coordinator_main
 import meadowgrid.agent_main
-from meadowflow.event_log import Event
+from meadowflow.event_log import Event, EventLog
 from meadowflow.events_arg import LatestEventsArg
 from meadowflow.job_runner_predicates import JobRunnerTypePredicate
 from meadowflow.jobs import (
@@ -23,6 +33,8 @@ from meadowflow.jobs import (
     JobFunction,
     JobPayload,
     JobRunOverrides,
+    JobRunner,
+    JobRunnerFunction,
     JobRunnerPredicate,
     LocalFunction,
     add_scope_jobs_decorator,
@@ -665,3 +677,177 @@ async def test_scopes():
         events = scheduler.events_of(pname("date_job", date=_TEST_DATE_2))
         assert 4 == len(events)
         assert f"hello, {_TEST_DATE_2}" == events[0].payload.result_value
+
+
+class _RecordingJobRunner(JobRunner):
+    """
+    A JobRunner that doesn't run anything, just records when jobs were submitted and
+    when it was polled. Jobs in finished get marked as SUCCEEDED on the next poll.
+    """
+
+    _SUBMIT_DELAY_SECONDS = 0.2
+
+    def __init__(self, event_log: EventLog):
+        self._event_log = event_log
+        # request_id -> time.time() when run returned
+        self.submitted: Dict[str, float] = {}
+        # (time.time(), request_ids) for each call to poll_jobs
+        self.polls: List[Tuple[float, List[str]]] = []
+        self.finished: Set[str] = set()
+
+    async def run(
+        self,
+        job_name: TopicName,
+        run_request_id: str,
+        job_runner_function: JobRunnerFunction,
+    ) -> None:
+        # simulate e.g. a round trip to the meadowgrid coordinator
+        await asyncio.sleep(self._SUBMIT_DELAY_SECONDS)
+        self.submitted[run_request_id] = time.time()
+
+    async def poll_jobs(self, last_events: Iterable[Event[JobPayload]]) -> None:
+        last_events = list(last_events)
+        self.polls.append(
+            (time.time(), [e.payload.request_id for e in last_events])  # type: ignore
+        )
+        for e in last_events:
+            if e.payload.request_id in self.finished:
+                self._event_log.append_event(
+                    e.topic_name, JobPayload(e.payload.request_id, "SUCCEEDED")
+                )
+
+    def can_run_function(self, job_runner_function: JobRunnerFunction) -> bool:
+        return True
+
+
+class _IsRecordingJobRunner(JobRunnerPredicate):
+    def apply(self, job_runner: JobRunner) -> bool:
+        return isinstance(job_runner, _RecordingJobRunner)
+
+
+@pytest.mark.asyncio
+async def test_poll_loop() -> None:
+    """
+    Tests that the poll loop is idle while nothing is running, doesn't poll for a job
+    until it has been submitted, then polls quickly and backs off
+    """
+    async with Scheduler(job_runner_poll_delay_seconds=0.4) as scheduler:
+        scheduler.register_job_runner(_RecordingJobRunner)
+        job_runner = scheduler._job_runners[-1]
+        assert isinstance(job_runner, _RecordingJobRunner)
+
+        scheduler.add_jobs(
+            [Job(pname("A"), LocalFunction(_run_func), [], _IsRecordingJobRunner())]
+        )
+
+        # nothing is running, so we shouldn't poll at all
+        await asyncio.sleep(0.5)
+        assert job_runner.polls == []
+
+        request_id = await scheduler.manual_run(pname("A"))
+        submitted = job_runner.submitted[request_id]
+        await asyncio.sleep(1.5)
+
+        # we should never poll for the job before it has been submitted
+        assert all(t >= submitted for t, _ in job_runner.polls)
+        poll_times = [t for t, ids in job_runner.polls if request_id in ids]
+        # we should poll soon after the job is submitted rather than waiting for
+        # job_runner_poll_delay_seconds
+        assert poll_times[0] - submitted < 0.2
+        # and then back off up to job_runner_poll_delay_seconds
+        gaps = [b - a for a, b in zip(poll_times, poll_times[1:])]
+        assert len(gaps) >= 3
+        assert gaps[0] < 0.2
+        assert gaps[-1] > 0.3
+        assert all(gap < 0.6 for gap in gaps)
+
+        # once the job finishes, we should go back to not polling at all
+        job_runner.finished.add(request_id)
+        await _wait_for_scheduler(scheduler)
+        assert scheduler.events_of(pname("A"))[0].payload.state == "SUCCEEDED"
+        num_polls = len(job_runner.polls)
+        await asyncio.sleep(1)
+        assert len(job_runner.polls) == num_polls
+
+
+@pytest.mark.asyncio
+async def test_active_job_names() -> None:
+    """
+    Tests that _active_job_names (and so all_are_waiting and the poll loop) follows jobs
+    through RUN_REQUESTED -> RUNNING -> SUCCEEDED/FAILED, and that a single event fans
+    out to every job that triggers on it
+    """
+    async with Scheduler(job_runner_poll_delay_seconds=0.05) as scheduler:
+        scheduler.register_job_runner(_RecordingJobRunner)
+        job_runner = scheduler._job_runners[-1]
+        assert isinstance(job_runner, _RecordingJobRunner)
+
+        def triggered_on_a(name: str, on_states: Sequence[str]) -> Job:
+            return Job(
+                pname(name),
+                LocalFunction(_run_func, [name]),
+                [
+                    TriggerAction(
+                        Actions.run, [AnyJobStateEventFilter((pname("A"),), on_states)]
+                    )
+                ],
+                JobRunnerTypePredicate("local"),
+            )
+
+        scheduler.add_jobs(
+            [
+                Job(pname("A"), LocalFunction(_run_func), [], _IsRecordingJobRunner()),
+                triggered_on_a("B", ("SUCCEEDED",)),
+                triggered_on_a("C", ("SUCCEEDED",)),
+                triggered_on_a("D", ("FAILED",)),
+            ]
+        )
+        # B and C wake on equal (hashable) EventFilters, so they share a single
+        # subscriber
+        assert len(scheduler._trigger_action_subscribers) == 2
+
+        def assert_num_events(expected: List[int]) -> None:
+            assert [
+                len(scheduler.events_of(pname(n))) for n in ("A", "B", "C", "D")
+            ] == expected
+
+        await _wait_for_scheduler(scheduler)
+        assert scheduler._active_job_names == set()
+        assert_num_events([1, 1, 1, 1])
+
+        # RUN_REQUESTED
+        request_id = await scheduler.manual_run(pname("A"))
+        await asyncio.sleep(0.1)
+        assert scheduler._active_job_names == {pname("A")}
+        assert not scheduler.all_are_waiting()
+
+        # RUNNING
+        scheduler._event_log.append_event(pname("A"), JobPayload(request_id, "RUNNING"))
+        await asyncio.sleep(0.1)
+        assert scheduler._active_job_names == {pname("A")}
+        assert not scheduler.all_are_waiting()
+
+        # SUCCEEDED, which triggers both B and C but not D
+        job_runner.finished.add(request_id)
+        await _wait_for_scheduler(scheduler)
+        assert scheduler._active_job_names == set()
+        assert_num_events([4, 4, 4, 1])
+        assert scheduler.events_of(pname("B"))[0].payload.state == "SUCCEEDED"
+        assert scheduler.events_of(pname("C"))[0].payload.state == "SUCCEEDED"
+
+        # FAILED straight from RUN_REQUESTED, which only triggers D
+        request_id = await scheduler.manual_run(pname("A"))
+        await asyncio.sleep(0.1)
+        assert scheduler._active_job_names == {pname("A")}
+        scheduler._event_log.append_event(
+            pname("A"),
+            JobPayload(request_id, "FAILED", failure_type="RUN_REQUEST_FAILED"),
+        )
+        await _wait_for_scheduler(scheduler)
+        assert scheduler._active_job_names == set()
+        assert_num_events([6, 4, 4, 4])
+
+        # once nothing is active, the poll loop should stop polling
+        num_polls = len(job_runner.polls)
+        await asyncio.sleep(0.3)
+        assert len(job_runner.polls) == num_polls
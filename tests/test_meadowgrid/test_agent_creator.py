@@ -1,9 +1,31 @@
+import asyncio
+import pickle
 import time
+from typing import Callable, List, Optional, Tuple
 
+import pandas as pd
 import pytest
 import meadowgrid.coordinator_main
 from meadowgrid import grid_map, ServerAvailableInterpreter
-from meadowgrid.config import MEADOWGRID_INTERPRETER
+from meadowgrid.agent_creator import (
+    AgentCreator,
+    OnDemandOrSpotType,
+    choose_instance_types_for_job,
+)
+from meadowgrid.config import MEADOWGRID_INTERPRETER, MEMORY_GB, LOGICAL_CPU
+from meadowgrid.coordinator import MeadowGridCoordinatorHandler
+from meadowgrid.coordinator_client import construct_resources_protobuf
+from meadowgrid.local_agent_creator import _LOCAL_INSTANCE_TYPES
+from meadowgrid.meadowgrid_pb2 import (
+    Job,
+    JobStatesRequest,
+    NextJobsRequest,
+    ProcessState,
+    PyCommandJob,
+    RegisterAgentRequest,
+    ServerAvailableInterpreter as ServerAvailableInterpreterProto,
+)
+from meadowgrid.resource_allocation import Resources
 
 
 @pytest.mark.asyncio
@@ -23,3 +45,172 @@ async def test_local_agent_creator():
             memory_gb_required_per_task=1,
             logical_cpu_required_per_task=0.5,
         )
+
+
+def test_choose_instance_types_for_job():
+    instance_types = _LOCAL_INSTANCE_TYPES[1]
+
+    def chosen(memory_gb, logical_cpu, num_workers):
+        result = choose_instance_types_for_job(
+            Resources(memory_gb, logical_cpu, {}), num_workers, 0, instance_types
+        )
+        assert (result["num_instances"] >= 1).all()
+        if len(result) > 0:
+            assert (
+                result["num_instances"] * result["workers_per_instance"]
+            ).sum() >= num_workers
+        return dict(zip(result["instance_type"], result["num_instances"]))
+
+    # the cheapest instance that fits a single worker
+    assert chosen(1, 1, 1) == {"2gb1cpu": 1}
+    # only 4gb2cpu fits 1 worker for the least money
+    assert chosen(3, 2, 3) == {"4gb2cpu": 3}
+    # enough workers to fill up larger instances
+    assert sum(chosen(1, 1, 100).values()) <= 50
+    # nothing is large enough
+    assert chosen(100, 1, 3) == {}
+
+    # the input should not get modified
+    assert "num_instances" not in instance_types.columns
+    assert "workers_per_instance" not in instance_types.columns
+
+
+class _StubAgentCreator(AgentCreator):
+    """Records the agents it is asked to launch, optionally failing every launch"""
+
+    def __init__(self, fail_launches: bool) -> None:
+        self.fail_launches = fail_launches
+        self.launched: List[Tuple[str, str, str]] = []
+
+    async def get_instance_types(self) -> Optional[pd.DataFrame]:
+        return _LOCAL_INSTANCE_TYPES[1]
+
+    async def launch_job_specific_agent(
+        self,
+        agent_id: str,
+        job_id: str,
+        instance_type: str,
+        on_demand_or_spot: OnDemandOrSpotType,
+    ) -> None:
+        if self.fail_launches:
+            raise ValueError("no instances available")
+        self.launched.append((agent_id, job_id, instance_type))
+
+    async def close(self) -> None:
+        pass
+
+
+def _simple_job(job_id: str) -> Job:
+    return Job(
+        job_id=job_id,
+        job_friendly_name=job_id,
+        priority=100,
+        interruption_probability_threshold=100,
+        server_available_interpreter=ServerAvailableInterpreterProto(
+            interpreter_path=MEADOWGRID_INTERPRETER
+        ),
+        py_command=PyCommandJob(command_line=["python", "--version"]),
+        resources_required=construct_resources_protobuf({MEMORY_GB: 1, LOGICAL_CPU: 1}),
+        result_highest_pickle_protocol=pickle.HIGHEST_PROTOCOL,
+    )
+
+
+async def _get_job_state(
+    handler: MeadowGridCoordinatorHandler, job_id: str
+) -> ProcessState:
+    return (
+        await handler.get_simple_job_states(JobStatesRequest(job_ids=[job_id]), None)
+    ).process_states[0]
+
+
+async def _wait_for_scheduling(
+    handler: MeadowGridCoordinatorHandler, done: Callable[[], bool]
+) -> None:
+    """Jobs are scheduled in the background by _schedule_jobs_loop"""
+    for _ in range(50):
+        if done():
+            return
+        await asyncio.sleep(0.1)
+    raise AssertionError("Job was not scheduled")
+
+
+@pytest.mark.asyncio
+async def test_coordinator_schedules_added_jobs():
+    async with MeadowGridCoordinatorHandler(None) as handler:
+        agent_creator = _StubAgentCreator(fail_launches=False)
+        handler._agent_creator = agent_creator
+
+        # with a generic agent available, the job should get a worker on that agent
+        await handler.register_agent(
+            RegisterAgentRequest(
+                agent_id="agent1",
+                resources=construct_resources_protobuf({MEMORY_GB: 1, LOGICAL_CPU: 1}),
+            ),
+            None,
+        )
+        await handler.add_job(_simple_job("job1"), None)
+        await _wait_for_scheduling(
+            handler, lambda: handler._generic_agents["agent1"]._pending_workers
+        )
+        next_jobs = await handler.get_next_jobs(
+            NextJobsRequest(agent_id="agent1"), None
+        )
+        assert [job.job.job_id for job in next_jobs.jobs_to_run] == ["job1"]
+        assert not agent_creator.launched
+
+        # the generic agent is now busy, so we should create a job-specific agent
+        await handler.add_job(_simple_job("job2"), None)
+        await _wait_for_scheduling(handler, lambda: agent_creator.launched)
+        [(agent_id, job_id, instance_type)] = agent_creator.launched
+        assert (job_id, instance_type) == ("job2", "2gb1cpu")
+        next_jobs = await handler.get_next_jobs(
+            NextJobsRequest(agent_id=agent_id, job_id="job2"), None
+        )
+        assert [job.job.job_id for job in next_jobs.jobs_to_run] == ["job2"]
+
+        # if creating the agent fails, the job should fail rather than never running
+        agent_creator.fail_launches = True
+        await handler.add_job(_simple_job("job3"), None)
+        await _wait_for_scheduling(
+            handler,
+            lambda: handler._simple_jobs["job3"].state.state
+            != ProcessState.ProcessStateEnum.RUN_REQUESTED,
+        )
+        state = await _get_job_state(handler, "job3")
+        assert state.state == ProcessState.ProcessStateEnum.RUN_REQUEST_FAILED
+        assert "no instances available" in pickle.loads(state.pickled_result)[1]
+
+
+def test_agent_creator_choose_instance_types_cache():
+    agent_creator = _StubAgentCreator(fail_launches=False)
+    instance_types = _LOCAL_INSTANCE_TYPES[1]
+
+    def chosen(instance_types, num_workers):
+        result = agent_creator.choose_instance_types_for_job(
+            Resources(1, 1, {}), num_workers, 0, instance_types
+        )
+        return dict(zip(result["instance_type"], result["num_instances"]))
+
+    assert chosen(instance_types, 1) == {"2gb1cpu": 1}
+    cached_instance_types, cached_results = agent_creator._prepared_instance_types
+    assert cached_instance_types is instance_types
+    [arrays] = cached_results.values()
+    assert list(arrays.allocations.keys()) == [1]
+
+    # the same instance types reuse the cached results
+    assert chosen(instance_types, 1) == {"2gb1cpu": 1}
+    chosen(instance_types, 5)
+    assert agent_creator._prepared_instance_types[1] is cached_results
+    assert list(cached_results.values()) == [arrays]
+    assert list(arrays.allocations.keys()) == [1, 5]
+
+    # refreshed instance types replace the whole cache
+    refreshed_instance_types = instance_types.copy()
+    refreshed_instance_types["price"] *= 2
+    assert chosen(refreshed_instance_types, 1) == {"2gb1cpu": 1}
+    assert agent_creator._prepared_instance_types[0] is refreshed_instance_types
+    assert agent_creator._prepared_instance_types[1] is not cached_results
+    assert len(agent_creator._prepared_instance_types[1]) == 1
+
+    # every AgentCreator has its own cache
+    assert _StubAgentCreator(fail_launches=False)._prepared_instance_types is None
@@ -1,12 +1,29 @@
+import contextlib
+import json
+import os
+import tempfile
 import time
+import unittest.mock
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+import pandas as pd
+import pytest
 
 from meadowgrid import grid_map, ServerAvailableInterpreter
 from meadowgrid.agent_creator import choose_instance_types_for_job
 from meadowgrid.aws_integration import (
+    _download_ec2_on_demand_prices,
     _get_ec2_instance_types,
+    _get_ec2_on_demand_prices,
+    _launch_ec2_instances_of_type,
+    _wait_for_spot_instance_requests,
     launch_meadowgrid_coordinator,
 )
-from meadowgrid.config import MEADOWGRID_INTERPRETER
+from meadowgrid.config import (
+    EC2_ON_DEMAND_PRICES_CACHE_SECS,
+    MEADOWGRID_INTERPRETER,
+    MEADOWGRID_REFRESH_EC2_ON_DEMAND_PRICES,
+)
 from meadowgrid.resource_allocation import Resources
 
 
@@ -43,3 +60,275 @@ async def manual_test_get_ec2_instance_types():
     )
     chosen_instance_types.to_clipboard()
     print(chosen_instance_types)
+
+
+def _on_demand_product(
+    instance_type: str, instance_family: Optional[str], price: str
+) -> Dict[str, Any]:
+    attributes = {
+        "instanceType": instance_type,
+        "physicalProcessor": "Intel Xeon Platinum 8175",
+        "memory": "8 GiB",
+        "vcpu": "2",
+    }
+    if instance_family is not None:
+        attributes["instanceFamily"] = instance_family
+    return {
+        "product": {"attributes": attributes},
+        "terms": {
+            "OnDemand": {
+                "sku": {
+                    "priceDimensions": {
+                        "dimension": {"unit": "Hrs", "pricePerUnit": {"USD": price}}
+                    }
+                }
+            }
+        },
+    }
+
+
+class _FakePricingClient:
+    """
+    Stands in for the boto3 pricing client. Filters are applied to products'
+    attributes the same way the pricing API applies them.
+    """
+
+    def __init__(self, products: List[Dict[str, Any]]) -> None:
+        self.products = products
+        self.get_products_filters: List[List[Dict[str, str]]] = []
+
+    def get_attribute_values(self, AttributeName: str, **kwargs: Any) -> List[Any]:
+        values = {
+            product["product"]["attributes"].get(AttributeName)
+            for product in self.products
+        }
+        return [{"Value": value} for value in sorted(values - {None})]
+
+    def get_products(self, Filters: List[Dict[str, str]], **kwargs: Any) -> List[str]:
+        self.get_products_filters.append(Filters)
+        results = []
+        for product in self.products:
+            attributes = product["product"]["attributes"]
+            matches = True
+            for f in Filters:
+                value = attributes.get(f["Field"])
+                if f["Type"] == "TERM_MATCH":
+                    matches &= value == f["Value"]
+                elif f["Type"] == "NONE_OF":
+                    matches &= value not in f["Value"].split(",")
+                else:
+                    raise ValueError(f"Unexpected filter type {f['Type']}")
+            if matches:
+                results.append(json.dumps(product))
+        return results
+
+
+def _fake_boto3_paginate(method: Any, **kwargs: Any) -> Iterable[Any]:
+    return method(**kwargs)
+
+
+def test_download_ec2_on_demand_prices_shards():
+    products = [
+        _on_demand_product("m5.large", "General purpose", "0.096"),
+        _on_demand_product("c5.large", "Compute optimized", "0.085"),
+        _on_demand_product("x1.large", None, "0.5"),
+    ]
+    for product in products:
+        product["product"]["attributes"].update(
+            regionCode="us-east-2",
+            preInstalledSw="NA",
+            operatingSystem="Linux",
+            tenancy="Shared",
+            capacitystatus="Used",
+        )
+    pricing_client = _FakePricingClient(products)
+
+    with unittest.mock.patch(
+        "meadowgrid.aws_integration._get_boto3_client", return_value=pricing_client
+    ), unittest.mock.patch(
+        "meadowgrid.aws_integration._boto3_paginate", _fake_boto3_paginate
+    ):
+        prices = _download_ec2_on_demand_prices("us-east-2")
+
+    # one query per instance family, plus one for products without a known family
+    assert len(pricing_client.get_products_filters) == 3
+    # the product without an instanceFamily should still be included
+    assert sorted(prices["instance_type"]) == ["c5.large", "m5.large", "x1.large"]
+    assert prices.set_index("instance_type")["price"].to_dict() == {
+        "m5.large": 0.096,
+        "c5.large": 0.085,
+        "x1.large": 0.5,
+    }
+
+
+class _FakeEC2Client:
+    """
+    Stands in for an aiobotocore EC2 client. run_instances launches at most
+    capacity instances per call, like EC2 does when it doesn't have enough capacity.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.run_instances_calls: List[Dict[str, Any]] = []
+        self.num_launched = 0
+
+    async def run_instances(self, **kwargs: Any) -> Dict[str, Any]:
+        self.run_instances_calls.append(kwargs)
+        num_instances = min(self.capacity, kwargs["MaxCount"])
+        if num_instances < kwargs["MinCount"]:
+            raise ValueError("InsufficientInstanceCapacity")
+        instance_ids = [
+            f"i-{i}"
+            for i in range(self.num_launched, self.num_launched + num_instances)
+        ]
+        self.num_launched += num_instances
+        return {"Instances": [{"InstanceId": i} for i in instance_ids]}
+
+    def get_waiter(self, name: str) -> Any:
+        async def wait(**kwargs: Any) -> None:
+            pass
+
+        return unittest.mock.Mock(wait=wait)
+
+    async def describe_instances(self, InstanceIds: List[str]) -> Dict[str, Any]:
+        return {
+            "Reservations": [
+                {
+                    "Instances": [
+                        {"InstanceId": i, "PublicDnsName": f"{i}.example.com"}
+                        for i in InstanceIds
+                    ]
+                }
+            ]
+        }
+
+    async def describe_spot_instance_requests(
+        self, SpotInstanceRequestIds: List[str]
+    ) -> Dict[str, Any]:
+        # the requests never get fulfilled
+        return {
+            "SpotInstanceRequests": [
+                {"SpotInstanceRequestId": request_id, "State": "open"}
+                for request_id in SpotInstanceRequestIds
+            ]
+        }
+
+
+def _patch_ec2_client(client: _FakeEC2Client) -> Any:
+    @contextlib.asynccontextmanager
+    async def create_client(*args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        yield client
+
+    return unittest.mock.patch(
+        "aiobotocore.session.get_session",
+        return_value=unittest.mock.Mock(create_client=create_client),
+    )
+
+
+@pytest.mark.asyncio
+async def test_launch_ec2_instances_of_type():
+    # if EC2 has capacity for everything, we launch all instances with one call
+    client = _FakeEC2Client(capacity=10)
+    with _patch_ec2_client(client):
+        public_dns_names = await _launch_ec2_instances_of_type(
+            "us-east-2", "m5.large", "on_demand", 3, "ami-1", tags={"a": "b"}
+        )
+    assert public_dns_names == [f"i-{i}.example.com" for i in range(3)]
+    [call] = client.run_instances_calls
+    assert call["MinCount"] == 1
+    assert call["MaxCount"] == 3
+    assert call["InstanceType"] == "m5.large"
+    assert call["ImageId"] == "ami-1"
+    assert call["TagSpecifications"] == [
+        {"ResourceType": "instance", "Tags": [{"Key": "a", "Value": "b"}]}
+    ]
+
+    # if EC2 only launches some of the instances, we ask for the rest
+    client = _FakeEC2Client(capacity=2)
+    with _patch_ec2_client(client):
+        public_dns_names = await _launch_ec2_instances_of_type(
+            "us-east-2", "m5.large", "on_demand", 5, "ami-1"
+        )
+    assert public_dns_names == [f"i-{i}.example.com" for i in range(5)]
+    assert [call["MaxCount"] for call in client.run_instances_calls] == [5, 3, 1]
+
+    # if EC2 can't launch anything, we fail
+    client = _FakeEC2Client(capacity=0)
+    with _patch_ec2_client(client):
+        with pytest.raises(ValueError, match="InsufficientInstanceCapacity"):
+            await _launch_ec2_instances_of_type(
+                "us-east-2", "m5.large", "on_demand", 5, "ami-1"
+            )
+
+
+@pytest.mark.asyncio
+async def test_wait_for_spot_instance_requests_timeout():
+    with unittest.mock.patch(
+        "meadowgrid.aws_integration._SPOT_REQUEST_CHECK_INITIAL_DELAY_SECS", 0.01
+    ), unittest.mock.patch(
+        "meadowgrid.aws_integration._SPOT_REQUEST_WAIT_TIMEOUT_SECS", 0.1
+    ):
+        with pytest.raises(TimeoutError, match="sir-1, sir-2"):
+            await _wait_for_spot_instance_requests(
+                _FakeEC2Client(capacity=0), ["sir-1", "sir-2"]
+            )
+
+
+def test_ec2_on_demand_prices_cache(capsys):
+    prices = pd.DataFrame(
+        {
+            "instance_type": ["m5.large", "c5.large"],
+            "memory_gb": [8.0, 4.0],
+            "logical_cpu": pd.Series([2, 2], dtype="int16"),
+            "price": [0.096, 0.085],
+        }
+    )
+
+    with tempfile.TemporaryDirectory() as home, unittest.mock.patch(
+        "meadowgrid.aws_integration._EC2_PRICES_CACHE_DIR",
+        os.path.join(home, ".meadowgrid", "cache"),
+    ), unittest.mock.patch(
+        "meadowgrid.aws_integration._download_ec2_on_demand_prices",
+        return_value=prices,
+    ) as download:
+        cache_path = os.path.join(
+            home, ".meadowgrid", "cache", "ec2_on_demand_prices_us-east-2.parquet"
+        )
+
+        # the first call downloads the prices and caches them
+        pd.testing.assert_frame_equal(_get_ec2_on_demand_prices("us-east-2"), prices)
+        assert download.call_count == 1
+        assert os.path.exists(cache_path)
+
+        # the second call reads them from the cache, with the same dtypes
+        pd.testing.assert_frame_equal(_get_ec2_on_demand_prices("us-east-2"), prices)
+        assert download.call_count == 1
+
+        # MEADOWGRID_REFRESH_EC2_ON_DEMAND_PRICES ignores the cache
+        with unittest.mock.patch.dict(
+            os.environ, {MEADOWGRID_REFRESH_EC2_ON_DEMAND_PRICES: "1"}
+        ):
+            _get_ec2_on_demand_prices("us-east-2")
+        assert download.call_count == 2
+
+        # a stale cache gets downloaded again
+        stale_time = time.time() - EC2_ON_DEMAND_PRICES_CACHE_SECS - 1
+        os.utime(cache_path, (stale_time, stale_time))
+        _get_ec2_on_demand_prices("us-east-2")
+        assert download.call_count == 3
+        # ...and re-cached
+        _get_ec2_on_demand_prices("us-east-2")
+        assert download.call_count == 3
+
+        # an unreadable cache is a one line warning, and we download the prices again
+        with open(cache_path, "wb") as f:
+            f.write(b"not a parquet file")
+        capsys.readouterr()
+        pd.testing.assert_frame_equal(_get_ec2_on_demand_prices("us-east-2"), prices)
+        assert download.call_count == 4
+        output = capsys.readouterr()
+        assert output.out.startswith(
+            f"Warning, unable to read cached data from {cache_path}: "
+        )
+        assert output.out.count("\n") == 1
+        assert output.err == ""